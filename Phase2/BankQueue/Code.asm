@@ -0,0 +1,20 @@
+LS SR5 SR0 0
+LS SR1 SR0 1
+LS SR2 SR0 2
+LS SR3 SR0 3
+LS SR4 SR0 4
+LS SR6 SR0 6
+SS SR6 SR0 5
+LV VR1 SR1
+LVI VR2 SR2 VR1
+LV VR3 SR3
+SVI VR2 SR4 VR3
+LS SR6 SR0 7
+ADD SR1 SR1 SR6
+LS SR6 SR0 7
+ADD SR3 SR3 SR6
+LS SR6 SR0 5
+SUB SR6 SR6 SR5
+SS SR6 SR0 5
+BGT SR6 SR0 -11
+HALT
\ No newline at end of file
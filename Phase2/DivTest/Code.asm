@@ -0,0 +1,13 @@
+LS SR1 SR0 0
+MTCL SR1
+LS SR2 SR0 1
+LS SR3 SR0 2
+LS SR4 SR0 3
+LS SR5 SR0 4
+LV VR1 SR0
+LV VR2 SR3
+DIVVV VR3 VR1 VR2
+DIVVS VR4 VR1 SR2
+SV VR3 SR4
+SV VR4 SR5
+HALT
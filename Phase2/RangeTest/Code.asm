@@ -0,0 +1 @@
+HALT
@@ -0,0 +1,10 @@
+LS SR1 SR0 0
+LS SR2 SR0 1
+LS SR5 SR0 2
+SLL SR3 SR1 SR2
+SRL SR4 SR5 SR0
+SRA SR6 SR3 SR2
+SLL SR7 SR5 SR2
+SS SR3 SR0 3
+SS SR4 SR0 4
+HALT
\ No newline at end of file
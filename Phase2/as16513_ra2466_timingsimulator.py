@@ -1,19 +1,58 @@
 import os
 import argparse
+import numpy as np
 
-from func_simulator import get_control_flow
+from func_simulator import get_control_flow, stream_control_flow, load_core
+from dynamic_trace import Trace, StreamingTrace, unpack_mask
+from dmem_store import WordStore, DUMP_MODES
+from flow_cache import FlowCache, DEFAULT_DIR, DEFAULT_MAX_BYTES
+from decoder import Opcode
+from scoreboard import Scoreboard, parse_hazards
+from memory_system import BankedMemory, BANK_BUSY_CYCLES, bank_options
+from pipeline_trace import PipelineRecorder
+from perf_counters import PerfCounters
+from fast_forward import FastForward, is_backward_branch
+from vls_model import VLSModel
+from checkpoint import Checkpoint, NONE
+from bisect import insort
 from collections import deque
 
-SCALAR_INSTRS = ['ADD', 'SUB', 'AND', 'OR', 'XOR', 'SLL', 'SRL', 'SRA', 'B', 'CVM', 'POP', 'MTCL', 'MFCL']
+BRANCH_INSTRS = ['BEQ', 'BNE', 'BGT', 'BLT', 'BGE', 'BLE']
+SCALAR_INSTRS = ['ADD', 'SUB', 'AND', 'OR', 'XOR', 'SLL', 'SRL', 'SRA', 'CVM', 'POP', 'MTCL', 'MFCL'] + BRANCH_INSTRS
 ADD_INSTRS = ['ADDVV', 'SUBVV', 'ADDVS', 'SUBVS', 'SEQVS', 'SNEVS', 'SGTVS', 'SLTVS', 'SGEVS', 'SLEVS', 'SEQVV', 'SNEVV', 'SGTVV', 'SLTVV', 'SGEVV', 'SLEVV']
 DIV_INSTRS = ['DIVVV', 'DIVVS']
 MUL_INSTRS = ['MULVV', 'MULVS']
+VLS_INSTRS = ['LV', 'SV', 'LVWS', 'SVWS', 'LVI', 'SVI']
+
+# Opcode sets for table lookups in the hot loops.
+SCALAR_OPCODES = {Opcode[name] for name in SCALAR_INSTRS + ['LS', 'SS', 'HALT']}
+ADD_OPCODES = {Opcode[name] for name in ADD_INSTRS}
+MUL_OPCODES = {Opcode[name] for name in MUL_INSTRS}
+DIV_OPCODES = {Opcode[name] for name in DIV_INSTRS}
+VLS_OPCODES = {Opcode[name] for name in VLS_INSTRS}
+LOAD_OPCODES = {Opcode.LV, Opcode.LVWS, Opcode.LVI}
+
+# Vector compute unit kind of each compute opcode; compares run on the add pipes.
+COMPUTE_KINDS = dict([(op, "add") for op in ADD_OPCODES] + [(op, "mul") for op in MUL_OPCODES] + [(op, "div") for op in DIV_OPCODES])
+
+NEVER = float("inf")
+
+STALL_REASONS = [None, "register", "queue"]
 
 class Config(object):
-    def __init__(self, iodir):
+    def __init__(self, iodir, overrides=None, parameters=None):
         self.filepath = os.path.abspath(os.path.join(iodir, "Config.txt"))
         self.parameters = {} # dictionary of parameter name: value as strings.
 
+        if parameters is not None: # Config.txt contents parsed earlier, e.g. cached by batch.py.
+            self.parameters = dict(parameters)
+        else:
+            self.load()
+
+        if overrides: # parameter name: value pairs that take precedence over Config.txt.
+            self.parameters.update({key: str(val) for key, val in overrides.items()})
+
+    def load(self):
         try:
             with open(self.filepath, 'r') as conf:
                 self.parameters = {line.split('=')[0].strip(): line.split('=')[1].split('#')[0].strip() for line in conf.readlines() if not (line.startswith('#') or line.strip() == '')}
@@ -26,88 +65,110 @@ class Config(object):
     def __getattr__(self, key):
         return int(self.parameters[key])
 
+    def get(self, key, default): # Optional parameter, converted to the type of its default.
+        return type(default)(self.parameters[key]) if key in self.parameters else default
+
 class IMEM(object):
-    def __init__(self, iodir):
+    def __init__(self, iodir, image=False, dumpMode="full", cache=None, jit=False, checkpoint=None, limit=None):
         self.size = pow(2, 16) # Can hold a maximum of 2^16 instructions.
         self.filepath = os.path.abspath(os.path.join(iodir, "Code.asm"))
         self.instructions = []
-        self.resolved_instruction_stream = None
-        self.DS = None
+        self.trace = None # Dynamic trace resolved by the functional simulator.
+        self._instructions = None # StaticEntry of every dynamic instruction of a Trace.
+        self.image = image # DMEM input/output options passed on to the functional simulator.
+        self.dumpMode = dumpMode
+        self.cache = cache # FlowCache of functional simulation results, or None.
+        self.jit = jit # Run the functional simulator on compiled basic blocks.
+        self.checkpoint = checkpoint # checkpoint.Checkpoint the functional simulator resumes from, or None.
+        self.limit = limit # Dynamic instructions the functional simulator runs at most, None for all.
 
     def __getitem__(self, PC):
-        if 0 <= PC < len(self.resolved_instruction_stream):
-            return self.resolved_instruction_stream[PC]
+        if self._instructions is not None:
+            return self._instructions[PC] if PC < len(self._instructions) else None
+        if self.trace.available(PC):
+            return self.trace[PC]
         else:
             return None
 
-    def resolve_instruction_stream(self):
-        self.resolved_instruction_stream, self.DS = get_control_flow(iodir)
-        # print(self.resolved_instruction_stream)
+    def available(self, PC): # True if the resolved stream has an instruction at PC.
+        if self._instructions is not None:
+            return PC < len(self._instructions)
+        return self.trace.available(PC)
+
+    def resolve_instruction_stream(self, tracepath=None, window=0, inFlight=None):
+        iodir = os.path.dirname(self.filepath)
+        if isinstance(tracepath, Trace): # Already resolved, e.g. by batch.py.
+            self.trace = tracepath
+        elif tracepath:
+            if self.checkpoint is not None or self.limit is not None:
+                raise Exception("IMEM - ERROR: A saved trace starts at the program start; restoring a checkpoint or limiting instructions needs the functional simulator")
+            self.trace = Trace.load(tracepath)
+        elif window:
+            self.trace = StreamingTrace(stream_control_flow(iodir, self.image, self.dumpMode, self.jit, self.checkpoint, self.limit), window, inFlight)
+        else:
+            self.trace = get_control_flow(iodir, self.image, self.dumpMode, self.cache, self.jit, self.checkpoint, self.limit)
+        # Fetch hands out shared per static instruction records instead of materializing a TraceEntry
+        # per dynamic instruction; a streaming trace only holds TraceEntries.
+        self._instructions = self.trace.instructions() if isinstance(self.trace, Trace) else None
 
     def Read(self, idx): # Use this to read from IMEM.
         if idx < self.size:
-            return self.DS[idx]
+            return self[idx]
         # else:
             # print("IMEM - ERROR: Invalid memory access at index: ", idx, " with memory size: ", self.size)
 
 class DMEM(object):
     # Word addressible - each address contains 32 bits.
-    def __init__(self, name, iodir, addressLen, numBanks=0):
+    def __init__(self, name, iodir, addressLen, numBanks=0, image=False, busyCycles=BANK_BUSY_CYCLES, interleave="modulo", queueDepth=0):
         self.name = name
         self.size = pow(2, addressLen)
         self.min_value  = -pow(2, 31)
         self.max_value  = pow(2, 31) - 1
-        self.ipfilepath = os.path.abspath(os.path.join(iodir, name + ".txt"))
+        self.ipfilepath = os.path.abspath(os.path.join(iodir, name + (".bin" if image else ".txt")))
         self.opfilepath = os.path.abspath(os.path.join(iodir, name + "OP.txt"))
-        self.data = []
-        self.banks = numBanks
-        self.bb = [0 for _ in range(numBanks)]
+        self.store = None
+        self.banks = BankedMemory(numBanks, busyCycles, interleave, queueDepth) if name == "VDMEM" else None
 
-        try:
-            with open(self.ipfilepath, 'r') as ipf:
-                self.data = [int(line.strip()) for line in ipf.readlines()]
-            # print(self.name, "- Data loaded from file:", self.ipfilepath)
-            # print(self.name, "- Data:", self.data)
-            self.data.extend([0x0 for i in range(self.size - len(self.data))])
-        except:
+        if not os.path.exists(self.ipfilepath):
             # print(self.name, "- ERROR: Couldn't open input file in path:", self.ipfilepath)
-            raise
+            raise FileNotFoundError(self.ipfilepath)
 
-    def Read(self, idx): # Use this to read from DMEM.
-        if self.name == "VDMEM":
-            bank = idx % self.banks
-            if not self.bb[bank]:
-                self.bb[bank] = 6
-                return True
-            else:
-                return False
+    @property
+    def data(self): # The timing model only tracks bank occupancy, so the contents are loaded on first use.
+        if self.store is None:
+            self.store = WordStore.load(self.ipfilepath, self.size)
+        return self.store.words
+
+    def Read(self, idx): # Use this to read from DMEM. Returns cycles until the access starts, None if refused.
+        if self.banks is not None:
+            return self.banks.request(idx)
         else:
-            return True
+            return 0
 
     def Write(self, idx): # Use this to write into DMEM.
-        if self.name == "VDMEM":
-            bank = idx % self.banks
-            if not self.bb[bank]:
-                self.bb[bank] = 6
-                return True
-            else:
-                return False
+        if self.banks is not None:
+            return self.banks.request(idx)
         else:
-            return True
+            return 0
         
     def cycle(self):
-        for i in range(self.banks):
-            if self.bb[i]:
-                self.bb[i] -= 1
+        if self.banks is not None:
+            self.banks.cycle()
 
     def remainingCycles(self):
-        return max(self.bb)
+        return self.banks.remainingCycles() if self.banks is not None else 0
+
+    def bankBusyCycles(self, idx): # Cycles until the bank holding idx can accept a request.
+        return self.banks.busyFor(idx)
+
+    def skip(self, n): # Equivalent to calling cycle() n times.
+        if self.banks is not None:
+            self.banks.skip(n)
 
-    def dump(self):
+    def dump(self, mode="full"):
         try:
-            with open(self.opfilepath, 'w') as opf:
-                lines = [str(data) + '\n' for data in self.data]
-                opf.writelines(lines)
+            self.data
+            self.store.dump(self.opfilepath[:-len(".txt")], mode)
             # print(self.name, "- Dumped data into output file in path:", self.opfilepath)
         except:
             # print(self.name, "- ERROR: Couldn't open output file in path:", self.opfilepath)
@@ -142,8 +203,33 @@ class RegisterFile(object):
             # print(self.name, "- ERROR: Couldn't open output file in path:", opfilepath)
             raise
 
+class ElementReadiness(object):
+    # Chaining state of an in-flight vector load: the cycle at which each element of its destination
+    # register is written. Elements the load leaves alone (masked off in LV) are ready from the start.
+    def __init__(self, opcode, VLR, mask, latency):
+        self.latency = latency # Cycles from a bank accepting an element's request to the element being written.
+        if opcode == Opcode.LV:
+            self.elements = np.flatnonzero(unpack_mask(mask, VLR)).tolist()
+        else:
+            self.elements = list(range(VLR))
+        self.readyAt = [0] * VLR
+        for e in self.elements:
+            self.readyAt[e] = NEVER
+        self._prefix = 0 # Elements [0, _prefix) are known to be written.
+
+    def accept(self, position, cycle): # The request for the position-th element was accepted in cycle.
+        self.readyAt[self.elements[position]] = cycle + self.latency
+
+    def finish(self, cycle): # The load completes in cycle; anything still outstanding is written by then.
+        self.readyAt = [min(r, cycle) for r in self.readyAt]
+
+    def ready(self, n, cycle): # True if elements [0, n) are written by cycle.
+        while self._prefix < n and self.readyAt[self._prefix] <= cycle:
+            self._prefix += 1
+        return self._prefix >= n
+
 class FunctionalUnitExecute():
-    def __init__(self, instr, PC, dynamicState, config, onCompletion, vdmem):
+    def __init__(self, instr, PC, dynamicState, config, onCompletion, vdmem, chain=None, chainedFrom=None, clock=None, counters=None, model=None):
         self.instr = instr
         self._PC = PC
         self._DS = dynamicState
@@ -152,31 +238,62 @@ class FunctionalUnitExecute():
         self._onCompletion = onCompletion
         self._ocf = False
         self._vdmem = vdmem
+        self._counters = counters # PerfCounters of the core, or None.
+        self._model = model # VLSModel tried on the first request cycle, or None.
+        self._started = False
+        self._estimate = None # The model's estimate of the request phase in verify mode.
         self.numCycles = self.calculateCycles()
         self.lanes = [None for _ in range(config.numLanes)]
+        self._free = list(range(config.numLanes)) # Lanes without a request, ascending.
+        self._waiting = {} # Bank -> lanes holding a refused request to it, ascending.
         self.conditionalE()
-        
+
+        # Vector chaining: a load publishes per-element readiness into chain, a compute instruction
+        # in chainedFrom waits on its producers one lane group at a time.
+        self._chain = chain
+        self.chainedFrom = chainedFrom or None
+        self._clock = clock
+        if chain is not None:
+            self._positions = [None for _ in range(config.numLanes)]
+            self._taken = 0
+        if self.chainedFrom is not None:
+            self._VLR = int(self._DS.VLR[self._PC])
+            self._groups = 0
+            groups = -(-self._VLR // config.numLanes)
+            self._drain = self.numCycles - groups
+            if groups == 0:
+                self.chainedFrom = None
 
     def cycle(self):
-        if not self._flag and self.numCycles > 0:
-            self.numCycles -= 1
-        elif self.instr[0] == "LVWS" or self.instr[0] == "SVWS":
-            self.cycle_LVWS_SVWS()
-        elif self.instr[0] == "LV" or self.instr[0] == "SV":
-            self.cycle_LV_SV()
-        elif self.instr[0] == "LVI" or self.instr[0] == "SVI":
-            self.cycle_LVI_SVI()
+        if self.chainedFrom is not None:
+            self.cycle_chained()
+        elif not self._flag:
+            if self.numCycles > 0:
+                self.numCycles -= 1
+        elif self.instr.opcode in VLS_OPCODES:
+            self.cycle_VLS()
 
     def conditionalE(self):
-        if self.instr[0] == "LVWS" or self.instr[0] == "SVWS":
-            self._flag = True
-        elif self.instr[0] == "LV" or self.instr[0] == "SV":
-            self._flag = True
-        elif self.instr[0] == "LVI" or self.instr[0] == "SVI":
+        if self.instr.opcode in VLS_OPCODES:
             self._flag = True
 
-        if self._flag:
-            self.addresses = deque([int(i) for i in self.instr[2][1:-1].split(",")])
+        if self._flag: # Requests are generated element by element: _pending has bit i set until element i is sent.
+            self._base, self._stride, self._indices, self._pending = self._DS.accessPattern(self._PC)
+
+    def remaining(self): # Requests not yet sent to the banks.
+        return self._pending.bit_count()
+
+    def pendingAddresses(self):
+        return [self._indices[e] if self._indices is not None else self._base + e * self._stride
+                for e in range(self._pending.bit_length()) if self._pending >> e & 1]
+
+    def restoreLanes(self, lanes): # Sets the lanes' addresses, e.g. from a checkpoint.
+        self.lanes = lanes
+        self._free = [i for i, address in enumerate(lanes) if address is None]
+        self._waiting = {}
+        for i, address in enumerate(lanes):
+            if address is not None:
+                self._waiting.setdefault(self._vdmem.banks.bankOf(address), []).append(i)
 
     def completed(self):
         if self.numCycles == 0:
@@ -186,38 +303,93 @@ class FunctionalUnitExecute():
             return True
         return False
     
-    def cycle_LVWS_SVWS(self):
-        self.cycle_VLS()
-
-    def cycle_LVI_SVI(self):
-        self.cycle_VLS()
+    def idleCycles(self):
+        # Number of upcoming cycles in which cycle() would only count down or wait on busy banks.
+        if self.chainedFrom is not None:
+            return 0
+        if not self._flag:
+            return max(self.numCycles, 0)
+        if not self._pending or None in self.lanes:
+            return 0
+        return min(self._vdmem.bankBusyCycles(address) for address in self.lanes)
 
-    def cycle_LV_SV(self):
-        self.cycle_VLS()
+    def skip(self, n): # Equivalent to n calls to cycle() that are known to be idle.
+        if not self._flag:
+            self.numCycles -= n
+        else: # Every lane waits on a busy bank throughout.
+            for address in self.lanes:
+                self._vdmem.banks.refused(address, n)
+            self._vdmem.banks.recordStall(n)
+            if self._counters is not None:
+                self._counters.vlsCycles += n
 
     def cycle_VLS(self):
-        for i, e in enumerate(self.lanes):
-            if e is None and len(self.addresses) > 0:
-                self.lanes[i] = self.addresses.popleft()
-            if self.lanes[i] is not None:
-                r = self._vdmem.Read(self.lanes[i])
-                if r:
-                    self.lanes[i] = None
-        if len(self.addresses) == 0:
-            self.numCycles = self._config.vlsPipelineDepth + 6 - 1
+        if self._model is not None and not self._started:
+            self._started = True
+            if self._model.start(self):
+                return
+        banks, lanes, free, waiting = self._vdmem.banks, self.lanes, self._free, self._waiting
+        if free and self._pending:
+            filled, pending = 0, self._pending
+            while filled < len(free) and pending:
+                i = free[filled]
+                filled += 1
+                element = (pending & -pending).bit_length() - 1
+                pending &= pending - 1
+                lanes[i] = self._indices[element] if self._indices is not None else self._base + element * self._stride
+                bank = banks.bankOf(lanes[i])
+                if bank in waiting:
+                    insort(waiting[bank], i)
+                else:
+                    waiting[bank] = [i]
+                if self._chain is not None:
+                    self._positions[i] = self._taken
+                    self._taken += 1
+            self._pending = pending
+            del free[:filled]
+        accepted = banks.arbitrate(waiting, lanes)
+        for i, wait in accepted:
+            lanes[i] = None
+            insort(free, i)
+            if self._chain is not None:
+                self._chain.accept(self._positions[i], self._clock() + wait)
+        if waiting: # A lane was refused.
+            banks.recordStall()
+        if self._counters is not None:
+            self._counters.vlsCycles += 1
+            self._counters.laneRequests += len(accepted)
+        if not self._pending:
+            if self._estimate is not None:
+                self._model.check(self)
+            self.numCycles = self._config.vlsPipelineDepth + self._vdmem.banks.busyCycles - 1 + self._vdmem.banks.drainCycles()
             self._flag = False
+            if self._chain is not None:
+                self._chain.finish(self._clock() + self.numCycles)
+
+    def cycle_chained(self): # Starts the next lane group once every producer has written its elements.
+        n = min((self._groups + 1) * self._config.numLanes, self._VLR)
+        now = self._clock()
+        if all(producer.ready(n, now) for producer in self.chainedFrom):
+            self._groups += 1
+            if n == self._VLR:
+                self.numCycles = self._drain
+                self.chainedFrom = None
+
+    def laneGroups(self): # Cycles the instruction holds a pipelined unit's entry stage.
+        return max(-(-int(self._DS.VLR[self._PC]) // self._config.numLanes), 1)
 
     def calculateCycles(self):
-        if self.instr[0] in SCALAR_INSTRS or self.instr[0] in ['LS', 'SS', 'HALT']:
+        opcode = self.instr.opcode
+        if opcode in SCALAR_OPCODES:
             return 1
-        elif self.instr[0] in ADD_INSTRS or self.instr[0] in MUL_INSTRS or self.instr[0] in DIV_INSTRS:
-            VLR = self._DS[self._PC]["VLR"]
+        elif opcode in ADD_OPCODES or opcode in MUL_OPCODES or opcode in DIV_OPCODES:
+            VLR = int(self._DS.VLR[self._PC])
 
-            if self.instr[0] in ADD_INSTRS:
+            if opcode in ADD_OPCODES:
                 pd = self._config.pipelineDepthAdd
-            elif self.instr[0] in MUL_INSTRS:
+            elif opcode in MUL_OPCODES:
                 pd = self._config.pipelineDepthMul
-            elif self.instr[0] in DIV_INSTRS:
+            elif opcode in DIV_OPCODES:
                 pd = self._config.pipelineDepthDiv
 
             cyc = (pd - 1 + (VLR / self._config.numLanes))
@@ -226,12 +398,122 @@ class FunctionalUnitExecute():
             self._flag = True
             return -100
 
+class ExecutionUnit(object):
+    # One pipe behind a dispatch queue. A pipelined unit takes a new instruction once the previous
+    # one has pushed all its lane groups in; otherwise it holds one instruction until it completes.
+    def __init__(self, name, kinds=None, pipelined=False):
+        self.name = name
+        self.kinds = kinds # Set of compute kinds the unit executes, None for any instruction.
+        self.pipelined = pipelined
+        self.active = [] # In-flight FunctionalUnitExecutes, oldest first.
+        self.blocked = 0 # Cycles until the entry stage frees up.
+        self.busyCycles = 0 # Cycles with at least one instruction executing.
+        self.occupancySum = 0 # Instructions executing, summed over cycles.
+
+    def accepts(self, kind):
+        if self.kinds is not None and kind not in self.kinds:
+            return False
+        if not self.pipelined:
+            return not self.active
+        return self.blocked == 0 and not (self.active and self.active[-1].chainedFrom is not None)
+
+class UnitPool(object):
+    # The execution units fed by one dispatch queue. Instructions leave the queue in order, up to
+    # issueWidth per cycle, each to the first unit of its kind that can take it.
+    def __init__(self, units, start, issueWidth=1):
+        self.units = units
+        self.start = start # (unit, instr, PC, onComplete) -> FunctionalUnitExecute
+        self.issueWidth = issueWidth
+        self.idle = True # No unit had an instruction or was blocked at the end of the last cycle.
+
+    def _unitFor(self, instr):
+        kind = COMPUTE_KINDS.get(instr.opcode)
+        for unit in self.units:
+            if unit.accepts(kind):
+                return unit
+        return None
+
+    def dispatch(self, queue):
+        for _ in range(self.issueWidth):
+            if not queue:
+                return
+            unit = self._unitFor(queue[0][0])
+            if unit is None:
+                return
+            fu = self.start(unit, *queue.popleft())
+            unit.active.append(fu)
+            if unit.pipelined and fu.chainedFrom is None:
+                unit.blocked = fu.laneGroups()
+
+    def cycle(self, queue):
+        # One cycle of the pool: retires finished instructions, dispatches from queue and advances the
+        # instructions in flight. Returns True if any of them is still executing.
+        for unit in self.units:
+            for fu in unit.active:
+                if fu.numCycles == 0:
+                    unit.active = [fu for fu in unit.active if not fu.completed()]
+                    break
+        if queue:
+            self.dispatch(queue)
+
+        flag, idle = False, True
+        for unit in self.units:
+            running = 0
+            for fu in unit.active:
+                if fu.numCycles != 0:
+                    fu.cycle()
+                    running += 1
+                else:
+                    fu.completed()
+            if running:
+                flag = True
+                unit.busyCycles += 1
+                unit.occupancySum += running
+            if unit.blocked:
+                unit.blocked -= 1
+            if unit.active or unit.blocked:
+                idle = False
+        self.idle = idle
+        return flag
+
+    def occupancy(self): # Instructions in flight.
+        return sum(len(unit.active) for unit in self.units)
+
+    def idleCycles(self, queue):
+        # None if the pool is empty and nothing waits to enter it, else as FunctionalUnitExecute.idleCycles.
+        idle = None
+        for unit in self.units:
+            for fu in unit.active:
+                n = fu.idleCycles()
+                if n == 0:
+                    return 0
+                idle = n if idle is None else min(idle, n)
+        if queue:
+            if self._unitFor(queue[0][0]) is not None:
+                return 0
+            kind = COMPUTE_KINDS.get(queue[0][0].opcode)
+            for unit in self.units:
+                if unit.pipelined and unit.blocked and (unit.kinds is None or kind in unit.kinds):
+                    idle = unit.blocked if idle is None else min(idle, unit.blocked)
+        return idle
+
+    def skip(self, n):
+        for unit in self.units:
+            for fu in unit.active:
+                fu.skip(n)
+            if unit.active:
+                unit.busyCycles += n
+                unit.occupancySum += len(unit.active) * n
+            unit.blocked = max(unit.blocked - n, 0)
+
 class Core():
-    def __init__(self, imem, sdmem, vdmem, config):
+    def __init__(self, imem, sdmem, vdmem, config, eventDriven=False, recorder=None):
         self.IMEM = imem
         self.SDMEM = sdmem
         self.VDMEM = vdmem
         self.config = config
+        self.eventDriven = eventDriven # Jump over cycles in which no unit, bank or stalled instruction changes state.
+        self.recorder = recorder # PipelineRecorder of per-instruction timelines, or None.
 
         self.RFs = {"SRF": RegisterFile("SRF", 8),
                     "VRF": RegisterFile("VRF", 8, 64)}
@@ -240,211 +522,499 @@ class Core():
         self.cycles = 0
         self.decoded = (None, None)
         self.STALL = False
-        self.SRFbb = [False for _ in range(8)]
-        self.VRFbb = [False for _ in range(8)]
+        self.stallReason = None # Why the last decode attempt failed: "register" or "queue".
+        self._registerStall = None # (dynamic index, scoreboard version) of the last decode that stalled on registers.
+        self.scoreboard = Scoreboard(8, parse_hazards(config.get("scoreboardHazards", "")))
+        self.chaining = bool(config.get("vectorChaining", 0))
+        self._producers = {} # Dynamic index of a queued or executing vector load -> its ElementReadiness.
+        self._chains = {} # Dynamic index of a chained compute instruction -> ElementReadiness it waits on.
+
+        # Loop fast-forwarding (see fast_forward.py): 1 skips loop iterations whose timing provably
+        # repeats, 2 also those whose bank pattern may drift, within a reported error bound.
+        mode = config.get("fastForward", 0)
+        self.fastForward = FastForward(mode, config.get("fastForwardPeriod", 8)) if mode else None
+        self._backwardBranch = None # Dynamic index of a backward branch issued this cycle.
+        if self.fastForward is not None and recorder is not None:
+            raise Exception("Core - ERROR: fastForward skips instructions, so it cannot record a pipeline trace")
+
+        # Closed-form request phases of strided vector loads/stores (see vls_model.py): 1 uses them in
+        # place of the cycle-by-cycle bank arbitration, 2 checks them against it.
+        mode = config.get("analyticVLS", 0)
+        self.vlsModel = VLSModel(mode) if mode else None
 
         self._scalarQueue = deque([])
         self._vectorDataQueue = deque([])
         self._vectorComputeQueue = deque([])
 
+        # Execution units behind each queue. The defaults keep one shared compute pipe; numAddUnits,
+        # numMulUnits and numDivUnits split it into separate pipes, pipelinedUnits lets a pipe take a
+        # new instruction every lane group and issueWidth sets instructions decoded/dispatched per cycle.
+        self.issueWidth = config.get("issueWidth", 1)
+        pipelined = bool(config.get("pipelinedUnits", 0))
+        counts = {kind: config.get(f"num{kind.capitalize()}Units", 0) for kind in ["add", "mul", "div"]}
+        if any(counts.values()):
+            computeUnits = [ExecutionUnit(f"vCQ.{kind}{i}", {kind}, pipelined) for kind in counts for i in range(max(counts[kind], 1))]
+        else:
+            computeUnits = [ExecutionUnit("vCQ", None, pipelined)]
+
+        self._queues = {"vDQ": self._vectorDataQueue, "vCQ": self._vectorComputeQueue, "sQ": self._scalarQueue}
         self._EXFront = {
-            "vDQ": None,
-            "vCQ": None,
-            "sQ": None
+            "vDQ": UnitPool([ExecutionUnit("vDQ")], self.startUnit),
+            "vCQ": UnitPool(computeUnits, self.startUnit, self.issueWidth),
+            "sQ": UnitPool([ExecutionUnit("sQ")], self.startUnit)
         }
-        
-    def run(self):
-        self.IMEM.resolve_instruction_stream()
+        self._pools = [(pool, self._queues[key]) for key, pool in self._EXFront.items()]
+
+        self.counters = PerfCounters(list(self._queues), config.numLanes)
 
+        # Decode dispatch table, indexed by opcode.
+        groups = [(['ADDVV', 'SUBVV', 'MULVV', 'DIVVV', 'ADDVS', 'SUBVS', 'MULVS', 'DIVVS'], self.issueVectorArith),
+                  (['SEQVV', 'SNEVV', 'SGTVV', 'SLTVV', 'SGEVV', 'SLEVV', 'SEQVS', 'SNEVS', 'SGTVS', 'SLTVS', 'SGEVS', 'SLEVS'], self.issueVectorCompare),
+                  (['CVM', 'HALT'], self.issueNoOperand),
+                  (['POP', 'MTCL', 'MFCL'], self.issueVectorLength),
+                  (['LS', 'SS'], self.issueScalarMemory),
+                  (['ADD', 'SUB', 'AND', 'OR', 'XOR', 'SLL', 'SRL', 'SRA'], self.issueScalarArith),
+                  (['LV', 'SV'], self.issueUnitStride),
+                  (['LVWS', 'SVWS', 'LVI', 'SVI'], self.issueStridedIndexed),
+                  (BRANCH_INSTRS, self.issueBranch)]
+        handlers = {name: handler for names, handler in groups for name in names}
+        self._issue = [handlers[op.name] for op in Opcode]
+
+    def run(self, tracepath=None, window=0, until=None):
+        self.IMEM.resolve_instruction_stream(tracepath, window, self.oldestInFlight)
+        if self.fastForward is not None and not isinstance(self.IMEM.trace, Trace):
+            raise Exception("Core - ERROR: fastForward looks ahead in the whole trace, so it cannot run with a streaming window")
+        checkpoint = self.IMEM.checkpoint
+        if checkpoint is not None and checkpoint.timing is not None:
+            self.loadState(checkpoint.timing, checkpoint.config)
+        return self.resume(until)
+
+    def resume(self, until=None):
+        # Simulates until the program drains and returns True, or returns False at the end of the
+        # first cycle at or past until, ready for resume() or checkpoint().
+        # Bound methods of the per-cycle stages, looked up once for the whole run.
+        execute, decode, fetch = self.Execute, self.InstructionDecode, self.InstructionFetch
+        sampleQueues, queues = self.counters.sampleQueues, list(self._queues.items())
+        banks = self.VDMEM.banks
         while True:
             self.cycles += 1
             
             ret = False
-            ret = self.Execute() or ret
-            ret = self.InstructionDecode() or ret
-            ret = self.InstructionFetch() or ret
+            ret = execute() or ret
+            ret = decode() or ret
+            ret = fetch() or ret
+            sampleQueues(queues)
 
-            self.VDMEM.cycle()
+            banks.cycle()
             if not ret:
-                break
+                return True
+
+            if self._backwardBranch is not None:
+                self.fastForward.atBranch(self, self._backwardBranch)
+                self._backwardBranch = None
+
+            if self.eventDriven:
+                self.skipIdleCycles()
+
+            if until is not None and self.cycles >= until:
+                return False
+
+    def checkpoint(self):
+        # Checkpoint of the simulation at the end of the current cycle. The functional simulator is
+        # re-run up to the oldest instruction still fetched, queued or executing, and the timing state
+        # is saved relative to it.
+        base = self.oldestInFlight()
+        fcore = load_core(os.path.dirname(self.IMEM.filepath), self.IMEM.image, self.IMEM.jit, self.IMEM.checkpoint)
+        base = fcore.advance(base) # Fewer if the program halts first; everything after it is drained already.
+        return Checkpoint(fcore.saveState(), self.saveState(base), self.config.parameters)
+
+    def oldestInFlight(self): # Dynamic index of the oldest instruction still fetched, queued or executing.
+        return min([self.PC] + [PC for queue in self._queues.values() for _, PC, _ in queue] +
+                   [fu._PC for pool in self._EXFront.values() for unit in pool.units for fu in unit.active] +
+                   list(self._producers) + list(self._chains) + ([self.decoded[1]] if self.decoded[0] is not None else []))
+
+    def _completionState(self, onComplete):
+        # (kind, registers released) of a completion callback: kind 0 does nothing, 1 releases the
+        # scoreboard and 2 also ends a load's chaining. Every release frees a prefix of the registers.
+        func, params = onComplete["func"], onComplete["params"]
+        if func == self.scoreboard.release:
+            return 1, len(params) - 1
+        if func == self.releaseLoad:
+            return 2, len(params) - 2
+        if getattr(func, "__name__", None) == "<lambda>":
+            return 0, 0
+        raise Exception("Core - ERROR: Cannot checkpoint a run that records a pipeline trace")
+
+    def _completion(self, kind, count, decoded, PC):
+        if kind == 1:
+            return {"func": self.scoreboard.release, "params": (decoded,) + decoded.registers[:count]}
+        if kind == 2:
+            return {"func": self.releaseLoad, "params": (PC, decoded) + decoded.registers[:count]}
+        return {"func": lambda x: x, "params": [0]}
+
+    def saveState(self, base):
+        # Integer arrays of the timing state, with dynamic indices relative to base (see checkpoint.py).
+        readiness = {} # id -> (number, ElementReadiness) of every chaining state referenced.
+        def ref(r):
+            if r is None:
+                return -1
+            return readiness.setdefault(id(r), (len(readiness), r))[0]
+
+        state = {"core": np.array([self.cycles, self.PC - base, NONE if self.decoded[1] is None else self.decoded[1] - base,
+                                   self.decoded[0] is not None, self.STALL, STALL_REASONS.index(self.stallReason)], dtype=np.int64)}
+        for key, queue in self._queues.items():
+            state["queue." + key] = np.array([(PC - base,) + self._completionState(c) for _, PC, c in queue], dtype=np.int64).reshape(-1, 3)
+        state["producers"] = np.array([(PC - base, ref(r)) for PC, r in self._producers.items()], dtype=np.int64).reshape(-1, 2)
+        state["chains"] = np.array([(PC - base,) + tuple(ref(r) for r in rs) + (-1,) * (2 - len(rs)) for PC, rs in self._chains.items()], dtype=np.int64).reshape(-1, 3)
+
+        units, fus, lanes = [], [], []
+        for pool in self._EXFront.values():
+            for unit in pool.units:
+                units.append([unit.blocked, unit.busyCycles, unit.occupancySum, len(unit.active)])
+                for fu in unit.active:
+                    chained = [ref(r) for r in fu.chainedFrom] if fu.chainedFrom is not None else []
+                    fus.append([fu._PC - base, *self._completionState(fu._onCompletion), fu.numCycles, fu._flag, fu._ocf,
+                                fu.remaining() if fu.instr.opcode in VLS_OPCODES else -1, ref(fu._chain), getattr(fu, "_taken", 0),
+                                fu.chainedFrom is not None, getattr(fu, "_groups", 0)] + chained + [-1] * (2 - len(chained)))
+                    positions = getattr(fu, "_positions", [None] * len(fu.lanes))
+                    lanes.append([NONE if a is None else a for a in fu.lanes] + [-1 if p is None else p for p in positions])
+        state["units"] = np.array(units, dtype=np.int64)
+        state["fus"] = np.array(fus, dtype=np.int64).reshape(-1, 13)
+        state["lanes"] = np.array(lanes, dtype=np.int64).reshape(-1, 2 * self.config.numLanes)
+
+        table = [r for _, r in sorted(readiness.values(), key=lambda entry: entry[0])]
+        state["readiness"] = np.array([(r.latency, r._prefix, len(r.elements), len(r.readyAt)) for r in table], dtype=np.int64).reshape(-1, 4)
+        state["readiness.elements"] = np.array([e for r in table for e in r.elements], dtype=np.int64)
+        state["readiness.readyAt"] = np.array([NONE if t == NEVER else t for r in table for t in r.readyAt], dtype=np.int64)
+
+        state["scoreboard"] = self.scoreboard.state(base, NONE)
+        state.update({"banks." + key: value for key, value in self.VDMEM.banks.state().items()})
+        state["counters"] = self.counters.state()
+        if self.vlsModel is not None:
+            state["vlsModel"] = self.vlsModel.state()
+        if self.fastForward is not None:
+            keys = ["branch", "cycle", "iterations", "instructions", "cycles", "errorBound"]
+            state["fastForward"] = np.array([[j[k] for k in keys] for j in self.fastForward.jumps], dtype=np.int64).reshape(-1, len(keys))
+        return state
+
+    def loadState(self, state, config):
+        # Restores saveState() on a fresh core whose trace starts at the saved base.
+        if config != self.config.parameters:
+            changed = sorted(k for k in set(config) | set(self.config.parameters) if config.get(k) != self.config.parameters.get(k))
+            raise Exception(f"Core - ERROR: The checkpoint was taken with a different Config.txt ({', '.join(changed)})")
+        if self.recorder is not None:
+            raise Exception("Core - ERROR: Cannot record a pipeline trace from a checkpoint")
+        trace = self.IMEM.trace
+
+        # self.PC stays 0 until the end, so a streaming trace keeps every entry while they are restored.
+        cycles, nextPC, decodedIdx, hasInstr, STALL, reason = state["core"].tolist()
+        self.cycles, self.STALL, self.stallReason = cycles, bool(STALL), STALL_REASONS[reason]
+        decodedIdx = None if decodedIdx == NONE else decodedIdx
+        self.decoded = (self.IMEM[decodedIdx] if hasInstr else None, decodedIdx)
+
+        table, elements, readyAt = [], iter(state["readiness.elements"].tolist()), iter(state["readiness.readyAt"].tolist())
+        for latency, prefix, numElements, VLR in state["readiness"].tolist():
+            r = ElementReadiness.__new__(ElementReadiness)
+            r.latency, r._prefix = latency, prefix
+            r.elements = [next(elements) for _ in range(numElements)]
+            r.readyAt = [NEVER if t == NONE else t for t in (next(readyAt) for _ in range(VLR))]
+            table.append(r)
+        self._producers = {PC: table[i] for PC, i in state["producers"].tolist()}
+        self._chains = {PC: [table[i] for i in refs if i >= 0] for PC, *refs in state["chains"].tolist()}
+
+        for key, queue in self._queues.items():
+            queue.clear()
+            for PC, kind, count in state["queue." + key].tolist():
+                decoded = self.IMEM[PC]
+                queue.append((decoded, PC, self._completion(kind, count, decoded, PC)))
+
+        fus, lanes = iter(state["fus"].tolist()), iter(state["lanes"].tolist())
+        numLanes = self.config.numLanes
+        units = [unit for pool in self._EXFront.values() for unit in pool.units]
+        for pool in self._EXFront.values():
+            pool.idle = False
+        for unit, (blocked, busyCycles, occupancySum, active) in zip(units, state["units"].tolist()):
+            unit.blocked, unit.busyCycles, unit.occupancySum = blocked, busyCycles, occupancySum
+            unit.active = []
+            for _ in range(active):
+                PC, kind, count, numCycles, flag, ocf, remaining, chain, taken, isChained, groups, *chained = next(fus)
+                decoded, laneState = self.IMEM[PC], next(lanes)
+                fu = FunctionalUnitExecute(decoded, PC, trace, self.config, self._completion(kind, count, decoded, PC), self.VDMEM,
+                                           chain=table[chain] if chain >= 0 else None,
+                                           chainedFrom=[table[i] for i in chained if i >= 0] if isChained else None,
+                                           clock=self.now, counters=self.counters)
+                fu.numCycles, fu._flag, fu._ocf = numCycles, bool(flag), bool(ocf)
+                for _ in range(fu.remaining() - remaining if remaining >= 0 else 0):
+                    fu._pending &= fu._pending - 1
+                fu.restoreLanes([None if a == NONE else a for a in laneState[:numLanes]])
+                if fu._chain is not None:
+                    fu._positions = [None if p < 0 else p for p in laneState[numLanes:]]
+                    fu._taken = taken
+                if fu.chainedFrom is not None:
+                    fu._groups = groups
+                unit.active.append(fu)
+
+        self.scoreboard.setState(state["scoreboard"], 0, NONE)
+        self.VDMEM.banks.setState({key[len("banks."):]: value for key, value in state.items() if key.startswith("banks.")})
+        self.counters.setState(state["counters"])
+        if self.vlsModel is not None:
+            self.vlsModel.setState(state["vlsModel"])
+        if self.fastForward is not None:
+            keys = ["branch", "cycle", "iterations", "instructions", "cycles", "errorBound"]
+            self.fastForward.jumps = [dict(zip(keys, row)) for row in state["fastForward"].tolist()]
+        self.PC = nextPC
+
+    def idleCycles(self):
+        # Cycles until the next event: a unit finishing, a bank freeing up or a stalled instruction
+        # being able to issue. 0 means the next cycle has to be simulated.
+        if not self.STALL and (self.decoded[0] or self.IMEM.available(self.PC)):
+            return 0
+
+        idle = None
+        for key, pool in self._EXFront.items():
+            n = pool.idleCycles(self._queues[key])
+            if n == 0:
+                return 0
+            if n is not None:
+                idle = n if idle is None else min(idle, n)
+        return idle or 0
+
+    def skipIdleCycles(self):
+        n = self.idleCycles()
+        if n == 0:
+            return
+
+        self.cycles += n
+        if self.STALL:
+            self.counters.decodeStalls[self.stallReason] += n
+            if self.recorder is not None:
+                self.recorder.stall(self.decoded[1], self.stallReason, n)
+        self.counters.sampleQueues(self._queues.items(), n)
+        for pool in self._EXFront.values():
+            pool.skip(n)
+        self.VDMEM.skip(n)
+        if not self.STALL: # Draining: fetch keeps walking past the end of the stream.
+            self.decoded = (None, self.PC + n - 1)
+            self.PC += n
 
     def Execute(self):
-        for key in self._EXFront:
-            if self._EXFront[key] is None or self._EXFront[key].completed():
-                if key == "vDQ" and len(self._vectorDataQueue) > 0:
-                    ins = self._vectorDataQueue.popleft()
-                    instr, PC, onComplete = ins
-                    self._EXFront["vDQ"] = FunctionalUnitExecute(instr, PC, self.IMEM.DS, self.config, onComplete, self.VDMEM)
-                elif key == "vCQ" and len(self._vectorComputeQueue) > 0:
-                    ins = self._vectorComputeQueue.popleft()
-                    instr, PC, onComplete = ins
-                    self._EXFront["vCQ"] = FunctionalUnitExecute(instr, PC, self.IMEM.DS, self.config, onComplete, self.VDMEM)
-                elif key == "sQ" and len(self._scalarQueue) > 0:
-                    ins = self._scalarQueue.popleft()
-                    instr, PC, onComplete = ins
-                    self._EXFront["sQ"] = FunctionalUnitExecute(instr, PC, self.IMEM.DS, self.config, onComplete, self.VDMEM)
-                else:
-                    self._EXFront[key] = None
         flag = False
-        for key in self._EXFront:
-            if self._EXFront[key] is not None and not self._EXFront[key].completed():
-                self._EXFront[key].cycle()
-                flag = True
-            
+        for pool, queue in self._pools:
+            if queue or not pool.idle: # An idle pool with nothing to dispatch has nothing to do.
+                flag = pool.cycle(queue) or flag
         return flag
 
+    def startUnit(self, unit, instr, PC, onComplete):
+        if self.recorder is not None:
+            self.recorder.start(PC, self.cycles, unit.name, self.VDMEM.banks.stallCycles if instr.opcode in VLS_OPCODES else None)
+            onComplete = {"func": self.recordCompletion, "params": (PC, onComplete)}
+        return FunctionalUnitExecute(instr, PC, self.IMEM.trace, self.config, onComplete, self.VDMEM,
+                                     chain=self._producers.get(PC), chainedFrom=self._chains.pop(PC, None), clock=self.now, counters=self.counters,
+                                     model=self.vlsModel if instr.opcode in VLS_OPCODES else None)
+
+    def recordCompletion(self, PC, onComplete):
+        self.recorder.complete(PC, self.cycles, self.VDMEM.banks.stallCycles)
+        onComplete["func"](*onComplete["params"])
+
+    def now(self):
+        return self.cycles
+
     def InstructionFetch(self):
         if not self.STALL:
             instr = self.IMEM[self.PC]
             self.decoded = (instr, self.PC)
+            if self.recorder is not None and instr is not None:
+                self.recorder.fetch(self.PC, self.cycles, instr)
             self.PC += 1
-        return (self.IMEM[self.PC] is not None)
+        return self.IMEM.available(self.PC)
 
     def InstructionDecode(self):
         if not self.decoded[0]:
             return False
         else:
-            if self.addToQueue(self.decoded):
+            if self.decode(self.decoded):
                 self.STALL = False
+                for _ in range(self.issueWidth - 1): # Wider issue decodes the following instructions in the same cycle.
+                    if not self.IMEM.available(self.PC):
+                        break
+                    self.decoded = (self.IMEM[self.PC], self.PC)
+                    if self.recorder is not None:
+                        self.recorder.fetch(self.PC, self.cycles, self.decoded[0])
+                    self.PC += 1
+                    if not self.decode(self.decoded):
+                        self.STALL = True
+                        break
             else:
                 self.STALL = True
         return True
+
+    def decode(self, dcd):
+        if self._registerStall == (dcd[1], self.scoreboard.version):
+            issued = False # Still waiting on registers: the scoreboard has not changed since the last attempt.
+        else:
+            self.stallReason = "register" # Issue handlers that find their queue full override this.
+            issued = self.addToQueue(dcd)
+            if not issued and self.stallReason == "register":
+                self._registerStall = (dcd[1], self.scoreboard.version)
+        if issued:
+            self.counters.issued += 1
+            if self.fastForward is not None and is_backward_branch(dcd[0]):
+                self._backwardBranch = dcd[1]
+        else:
+            self.counters.decodeStalls[self.stallReason] += 1
+        if self.recorder is not None:
+            PC = dcd[1]
+            self.recorder.decode(PC, self.cycles)
+            if issued:
+                self.recorder.issue(PC, self.cycles)
+            else:
+                self.recorder.stall(PC, self.stallReason)
+        return issued
     
     def addToQueue(self, dcd):
-        PC = dcd[1]
-        decoded = dcd[0].split(" ")
-        d = decoded[0]
-        if d == "ADDVV" or d == "SUBVV" or d == "MULVV" or d == "DIVVV" or \
-              d == "ADDVS" or d == "SUBVS" or d == "MULVS"  or d == "DIVVS":
-            r1, r2, r3 = decoded[1], decoded[2], decoded[3]
-            if self.checkRegBB(r1, r2, r3):
-                self.updateRegBB(True, r1)
-
-                if len(self._vectorComputeQueue) < self.config.computeQueueDepth:
-                    self._vectorComputeQueue.append((decoded, PC, {
-                                "func": self.updateRegBB,
-                                "params": (False, r1)
-                    }))
-                    return True
-                else:
-                    print("DQ")
-                    self.updateRegBB(False, r1)
-
-        elif d == "SEQVV" or d == "SNEVV" or d == "SGTVV" or d == "SLTVV" or \
-            d == "SGEVV"  or d == "SLEVV" or d == "SEQVS" or d == "SNEVS" or \
-            d == "SGTVS" or d == "SLTVS" or d == "SGEVS" or d == "SLEVS":
-            r1, r2 = decoded[1], decoded[2]
-            if self.checkRegBB(r1, r2):
-                self.updateRegBB(True, r1, r2)
-
-                if len(self._vectorComputeQueue) < self.config.computeQueueDepth:
-                    self._vectorComputeQueue.append((decoded, PC, {
-                    "func": self.updateRegBB,
-                    "params": (False, r1)
+        decoded, PC = dcd
+        return self._issue[decoded.opcode](decoded, PC)
+
+    def chainSources(self, dest, *srcs):
+        # In chaining mode, the vector sources being written by an in-flight load: returns their
+        # ElementReadiness and the scoreboard bits the consumer may ignore. A source that is also
+        # the destination is never chained.
+        producers, ignore = [], 0
+        if not self.chaining:
+            return producers, ignore
+        for reg in srcs:
+            if reg[0] == "V" and reg != dest:
+                writer = self.scoreboard.pendingWriter(reg)
+                if writer in self._producers:
+                    producers.append(self._producers[writer])
+                    ignore |= 1 << self.scoreboard.bit(reg)
+        return producers, ignore
+
+    def releaseLoad(self, PC, decoded, *regs): # Completion of a vector load that consumers may chain from.
+        del self._producers[PC]
+        self.scoreboard.release(decoded, *regs)
+
+    def loadCompletion(self, decoded, PC, *regs):
+        if self.chaining and decoded.opcode in LOAD_OPCODES:
+            trace = self.IMEM.trace
+            self._producers[PC] = ElementReadiness(decoded.opcode, int(trace.VLR[PC]), trace.mask(PC), self.config.vlsPipelineDepth + self.VDMEM.banks.busyCycles - 1)
+            return {"func": self.releaseLoad, "params": (PC, decoded) + regs}
+        return {"func": self.scoreboard.release, "params": (decoded,) + regs}
+
+    def issueVectorArith(self, decoded, PC):
+        r1, r2, r3 = decoded.registers
+        producers, ignore = self.chainSources(r1, r2, r3)
+        if self.scoreboard.ready(decoded, r1, r2, r3, ignore=ignore):
+            self.scoreboard.reserve(PC, decoded, r1)
+
+            if len(self._vectorComputeQueue) < self.config.computeQueueDepth:
+                self._vectorComputeQueue.append((decoded, PC, {
+                            "func": self.scoreboard.release,
+                            "params": (decoded, r1)
                 }))
-                    return True
-                else:
-                    print("CQ")
-                    self.updateRegBB(False, r1, r2)
+                if producers:
+                    self._chains[PC] = producers
+                return True
+            else:
+                print("DQ")
+                self.stallReason = "queue"
+                self.scoreboard.release(decoded, r1)
+        return False
+
+    def issueVectorCompare(self, decoded, PC):
+        r1, r2 = decoded.registers
+        producers, ignore = self.chainSources(None, r1, r2)
+        if self.scoreboard.ready(decoded, r1, r2, ignore=ignore):
+            self.scoreboard.reserve(PC, decoded, r1, r2)
+
+            if len(self._vectorComputeQueue) < self.config.computeQueueDepth:
+                self._vectorComputeQueue.append((decoded, PC, {
+                "func": self.scoreboard.release,
+                "params": (decoded, r1)
+            }))
+                if producers:
+                    self._chains[PC] = producers
+                return True
+            else:
+                print("CQ")
+                self.stallReason = "queue"
+                self.scoreboard.release(decoded, r1, r2)
+        return False
 
-        elif d == "CVM" or d == "HALT":
+    def issueNoOperand(self, decoded, PC):
+        self._scalarQueue.append((decoded, PC, {
+            "func": lambda x: x,
+            "params": [0] 
+        }))
+        return True
+
+    def issueVectorLength(self, decoded, PC):
+        r1, = decoded.registers
+        if self.scoreboard.ready(decoded, r1):
+            self.scoreboard.reserve(PC, decoded, r1)
             self._scalarQueue.append((decoded, PC, {
-                "func": lambda x: x,
-                "params": [0] 
+                "func": self.scoreboard.release,
+                "params": (decoded, r1)
             }))
             return True
-        
-        elif d == "POP" or d == "MTCL" or d == "MFCL":
-            r1 = decoded[1]
-            if self.checkRegBB(r1):
-                self.updateRegBB(True, r1)
-                self._scalarQueue.append((decoded, PC, {
-                    "func": self.updateRegBB,
-                    "params": (False, r1)
-                }))
-                return True
+        return False
 
-        elif d == "LS" or d == "SS":
-            i = self.IMEM.Read(PC)["I"]
-            r1, r2 = i[1], i[2]
-            if self.checkRegBB(r1, r2):
-                self.updateRegBB(True, r1, r2)
-                self._scalarQueue.append((decoded, PC, {
-                    "func": self.updateRegBB,
-                    "params": (False, r1, r2)
-                }))
-                return True
+    def issueScalarMemory(self, decoded, PC):
+        r1, r2 = decoded.registers
+        if self.scoreboard.ready(decoded, r1, r2):
+            self.scoreboard.reserve(PC, decoded, r1, r2)
+            self._scalarQueue.append((decoded, PC, {
+                "func": self.scoreboard.release,
+                "params": (decoded, r1, r2)
+            }))
+            return True
+        return False
 
-        elif d == "ADD" or d == "SUB" or d == "AND" or d == "OR" or \
-            d == "XOR" or d == "SLL" or d == "SRL" or d == "SRA":
-                r1, r2, r3 = decoded[1], decoded[2], decoded[3]
-                if self.checkRegBB(r1, r2, r3):
-                    self.updateRegBB(True, r1)
-                    self._scalarQueue.append((decoded, PC, {
-                    "func": self.updateRegBB,
-                    "params": (False, r1)
-                }))
-                    return True
-                
-        elif d == "LV" or d == "SV":
-            i = self.IMEM.Read(PC)["I"]
-            r1, r2 = i[1], i[2]
-            if self.checkRegBB(r1, r2):
-                self.updateRegBB(True, r1)
-                if len(self._vectorDataQueue) < self.config.dataQueueDepth:
-                    self._vectorDataQueue.append((decoded, PC, {
-                        "func": self.updateRegBB,
-                        "params": (False, r1)
-                    }))
-                else:
-                    self.updateRegBB(False, r1)
-                return True
-            
-        elif d == "LVWS" or d == "SVWS" or d == "SVI" or d == "LVI":
-            i = self.IMEM.Read(PC)["I"]
-            r1, r2, r3 = i[1], i[2], i[3]
-            if self.checkRegBB(r1, r2, r3):
-                self.updateRegBB(True, r1)
-                if len(self._vectorDataQueue) < self.config.dataQueueDepth:
-                    self._vectorDataQueue.append((decoded, PC, {
-                        "func": self.updateRegBB,
-                        "params": (False, r1)
-                    }))
-                    return True
-                else:
-                    self.updateRegBB(False, r1)
-            
-        elif d == "B":
-            i = self.IMEM.Read(PC)["I"]
-            r1, r2 = i[1], i[2]
-            if self.checkRegBB(r1, r2):
-                self.updateRegBB(True, r1, r2)
-                self._scalarQueue.append((decoded, PC, {
-                    "func": self.updateRegBB,
-                    "params": (False, r1, r2)
-                }))
+    def issueScalarArith(self, decoded, PC):
+        r1, r2, r3 = decoded.registers
+        if self.scoreboard.ready(decoded, r1, r2, r3):
+            self.scoreboard.reserve(PC, decoded, r1)
+            self._scalarQueue.append((decoded, PC, {
+            "func": self.scoreboard.release,
+            "params": (decoded, r1)
+        }))
+            return True
+        return False
+
+    def issueUnitStride(self, decoded, PC):
+        r1, r2 = decoded.registers
+        if self.scoreboard.ready(decoded, r1, r2):
+            self.scoreboard.reserve(PC, decoded, r1)
+            if len(self._vectorDataQueue) < self.config.dataQueueDepth:
+                self._vectorDataQueue.append((decoded, PC, self.loadCompletion(decoded, PC, r1)))
+            else:
+                self.scoreboard.release(decoded, r1)
+            return True
+        return False
+
+    def issueStridedIndexed(self, decoded, PC):
+        r1, r2, r3 = decoded.registers
+        if self.scoreboard.ready(decoded, r1, r2, r3):
+            self.scoreboard.reserve(PC, decoded, r1)
+            if len(self._vectorDataQueue) < self.config.dataQueueDepth:
+                self._vectorDataQueue.append((decoded, PC, self.loadCompletion(decoded, PC, r1)))
                 return True
+            else:
+                self.stallReason = "queue"
+                self.scoreboard.release(decoded, r1)
+        return False
 
+    def issueBranch(self, decoded, PC):
+        r1, r2 = decoded.registers
+        if self.scoreboard.ready(decoded, r1, r2):
+            self.scoreboard.reserve(PC, decoded, r1, r2)
+            self._scalarQueue.append((decoded, PC, {
+                "func": self.scoreboard.release,
+                "params": (decoded, r1, r2)
+            }))
+            return True
         return False
     
-    def checkRegBB(self, *args):
-        avail = True
-        for arg in args:
-            r = int(arg[2:])
-            if arg[0] == "S":
-                avail = avail and not self.SRFbb[r]
-            elif arg[0] == "V":
-                avail = avail and not self.VRFbb[r]
-        return avail
-
-    def updateRegBB(self, val, *args):
-         for arg in args:
-            r = int(arg[2:])
-            if arg[0] == "S":
-                self.SRFbb[r] = val
-            elif arg[0] == "V":
-                self.VRFbb[r] = val
-
     def dumpregs(self, iodir):
         for rf in self.RFs.values():
             rf.dump(iodir)
@@ -453,6 +1023,22 @@ if __name__ == "__main__":
     #parse arguments for input file location
     parser = argparse.ArgumentParser(description='Vector Core Timing Simulator')
     parser.add_argument('--iodir', default="", type=str, help='Path to the folder containing the input files - instructions and data.')
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument('--trace', default=None, type=str, help='Time a trace saved by func_simulator.py --trace instead of running the functional simulator.')
+    source.add_argument('--stream-window', default=0, type=int, help='Run the functional simulator alongside the timing model, keeping only this many resolved instructions in memory, plus older ones still in flight.')
+    parser.add_argument('--image', action='store_true', help='Load SDMEM/VDMEM from raw int32 images (SDMEM.bin, VDMEM.bin) instead of text.')
+    parser.add_argument('--dump-mode', default="full", choices=DUMP_MODES, help='How the functional simulator writes SDMEMOP/VDMEMOP: full text, sparse (changed words only) or a binary image.')
+    parser.add_argument('--cache', action='store_true', help='Reuse functional simulation results cached for identical Code.asm/SDMEM/VDMEM inputs.')
+    parser.add_argument('--cache-dir', default=DEFAULT_DIR, type=str, help='Location of the functional simulation cache.')
+    parser.add_argument('--cache-size-mb', default=DEFAULT_MAX_BYTES >> 20, type=int, help='Evict least recently used cache entries beyond this size.')
+    parser.add_argument('--jit', action='store_true', help='Run the functional simulator on compiled basic blocks.')
+    parser.add_argument('--event-driven', action='store_true', help='Skip idle cycles instead of ticking through them. Cycle counts are unchanged.')
+    parser.add_argument('--stats', default=None, type=str, help='Write performance counters (decode stalls by cause, unit and queue occupancy, lane utilization, bank conflicts) as JSON.')
+    parser.add_argument('--restore', default=None, type=str, help='Resume from a checkpoint written by func_simulator.py or by --checkpoint.')
+    parser.add_argument('--checkpoint', default=None, type=str, help='Write a checkpoint of the functional and timing state to this file at --checkpoint-at-cycle.')
+    parser.add_argument('--checkpoint-at-cycle', default=None, type=int, help='Cycle at whose end --checkpoint is written; the run then continues.')
+    parser.add_argument('--max-instructions', default=None, type=int, help='Time only this many dynamic instructions, e.g. a region of interest after --restore.')
+    parser.add_argument('--pipeline-trace', default=None, type=str, help='Record every instruction\'s fetch/decode/issue/start/complete cycles, unit and stalls, and write them as Chrome trace-event JSON (open in ui.perfetto.dev).')
     args = parser.parse_args()
 
     iodir = os.path.abspath(args.iodir)
@@ -462,20 +1048,49 @@ if __name__ == "__main__":
     config = Config(iodir)
 
     # Parse IMEM
-    imem = IMEM(iodir)  
+    cache = FlowCache(args.cache_dir, args.cache_size_mb << 20) if args.cache else None
+    checkpoint = Checkpoint.load(args.restore) if args.restore else None
+    imem = IMEM(iodir, args.image, args.dump_mode, cache, args.jit, checkpoint, args.max_instructions)
     # Parse SMEM
-    sdmem = DMEM("SDMEM", iodir, 13) # 32 KB is 2^15 bytes = 2^13 K 32-bit words.
+    sdmem = DMEM("SDMEM", iodir, 13, image=args.image) # 32 KB is 2^15 bytes = 2^13 K 32-bit words.
     # Parse VMEM
-    vdmem = DMEM("VDMEM", iodir, 17, config.vdmNumBanks) # 512 KB is 2^19 bytes = 2^17 K 32-bit words. 
+    vdmem = DMEM("VDMEM", iodir, 17, config.vdmNumBanks, args.image, **bank_options(config)) # 512 KB is 2^19 bytes = 2^17 K 32-bit words. 
 
     # Create Vector Core
-    vcore = Core(imem, sdmem, vdmem, config)
+    recorder = PipelineRecorder() if args.pipeline_trace else None
+    vcore = Core(imem, sdmem, vdmem, config, args.event_driven, recorder)
 
     # Run Core
-    vcore.run()
+    if checkpoint is not None:
+        print(f"Checkpoint - Resuming after {checkpoint.instructions} instructions and {checkpoint.cycles} cycles from: {os.path.abspath(args.restore)}")
+    if args.checkpoint and args.checkpoint_at_cycle is not None:
+        if not vcore.run(args.trace, args.stream_window, args.checkpoint_at_cycle):
+            vcore.checkpoint().save(args.checkpoint)
+            print(f"Checkpoint - State at cycle {vcore.cycles} written to: {os.path.abspath(args.checkpoint)}")
+            vcore.resume()
+    else:
+        vcore.run(args.trace, args.stream_window)
 
     print(f"\n================================")
     print(f"Total Cycles Taken: {vcore.cycles}".upper())
     print(f"================================\n")
 
+    if vcore.fastForward is not None:
+        ff = vcore.fastForward.report()
+        estimated = ", other counters are estimates" if ff['mode'] == "approximate" and ff['loops'] else ""
+        print(f"Fast-forward ({ff['mode']}): {ff['loops']} loops, {ff['instructions']} instructions and {ff['cycles']} cycles extrapolated, error bound +/-{ff['errorBound']} cycles{estimated}\n")
+
+    if vcore.vlsModel is not None:
+        vm = vcore.vlsModel.report()
+        checked = f", {vm['verified']} verified against the cycle-by-cycle model" if vm['mode'] == "verify" else ""
+        print(f"Analytic VLS ({vm['mode']}): {vm['solved']} vector loads/stores solved in closed form, {vm['simulated']} simulated{checked}\n")
+
+    if args.stats:
+        vcore.counters.save(vcore, args.stats)
+        print("Performance counters written to:", os.path.abspath(args.stats))
+
+    if recorder is not None:
+        recorder.save(args.pipeline_trace)
+        print("Pipeline trace written to:", os.path.abspath(args.pipeline_trace))
+
     # THE END
\ No newline at end of file
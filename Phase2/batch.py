@@ -0,0 +1,208 @@
+import os
+import io
+import sys
+import json
+import time
+import queue
+import argparse
+import threading
+import contextlib
+import multiprocessing
+from collections import OrderedDict
+
+import func_simulator
+from as16513_ra2466_timingsimulator import Config, IMEM, DMEM, Core
+from memory_system import bank_options
+from dmem_store import WordStore, DUMP_MODES
+from regression import time_limit
+
+# Throughput mode for many independent programs. Warm worker processes are started once and keep the
+# simulator modules imported. Each keeps the inputs it has parsed: decoded Code.asm programs, Config.txt
+# parameters and SDMEM/VDMEM contents, keyed by path, size and modification time. Every worker has its
+# own job queue; the dispatcher deals jobs out round robin and a worker whose queue is empty steals
+# from the others, so a few long programs do not leave the rest of the pool idle. Results are written
+# as JSON lines in completion order while the batch runs.
+#
+# A manifest line is either an IO directory or a JSON object {"iodir": ..., "config": {...}} whose
+# config entries override Config.txt. With "-" the manifest is read from stdin as it arrives, so a
+# long-running producer can keep feeding jobs to the same workers.
+
+class WarmCache(object):
+    # A worker's parsed inputs, least recently used first evicted beyond maxEntries per kind.
+    def __init__(self, maxEntries=64):
+        self.maxEntries = maxEntries
+        self.entries = {"program": OrderedDict(), "config": OrderedDict(), "image": OrderedDict()}
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, kind, path, load):
+        stat = os.stat(path)
+        key = (path, stat.st_size, stat.st_mtime_ns)
+        entries = self.entries[kind]
+        if key in entries:
+            entries.move_to_end(key)
+            self.hits += 1
+            return entries[key]
+        self.misses += 1
+        value = entries[key] = load()
+        if len(entries) > self.maxEntries:
+            entries.popitem(last=False)
+        return value
+
+    def program(self, iodir): # func_simulator.IMEM; read-only once decoded, so it is shared between jobs.
+        return self._get("program", os.path.join(iodir, "Code.asm"), lambda: func_simulator.IMEM(iodir))
+
+    def config(self, iodir, overrides=None):
+        parameters = self._get("config", os.path.join(iodir, "Config.txt"), lambda: Config(iodir).parameters)
+        return Config(iodir, overrides, parameters)
+
+    def dmem(self, name, iodir, addressLen, image=False): # func_simulator.DMEM on a private copy of the cached contents.
+        path = os.path.abspath(os.path.join(iodir, name + (".bin" if image else ".txt")))
+        words = self._get("image", path, lambda: WordStore.load(path, pow(2, addressLen)).words)
+        return func_simulator.DMEM(name, iodir, addressLen, image, WordStore(len(words), words.copy()))
+
+def run_job(job, cache, options):
+    # Simulates one manifest entry and returns its result record.
+    iodir, start = job["iodir"], time.perf_counter()
+    result = {"job": job["job"], "iodir": iodir, "cycles": None, "instructions": None, "error": None}
+    try:
+        with time_limit(options["timeout"]), contextlib.redirect_stdout(io.StringIO()):
+            fcore = func_simulator.Core(cache.program(iodir), cache.dmem("SDMEM", iodir, 13, options["image"]),
+                                        cache.dmem("VDMEM", iodir, 17, options["image"]), options["jit"])
+            trace = fcore.run()
+            if options["dump"]:
+                fcore.dumpregs(iodir)
+                fcore.SDMEM.dump(options["dumpMode"])
+                fcore.VDMEM.dump(options["dumpMode"])
+
+            config = cache.config(iodir, job.get("config"))
+            vdmem = DMEM("VDMEM", iodir, 17, config.vdmNumBanks, options["image"], **bank_options(config))
+            vcore = Core(IMEM(iodir), DMEM("SDMEM", iodir, 13, image=options["image"]), vdmem, config, options["eventDriven"])
+            vcore.run(trace)
+        result.update(cycles=vcore.cycles, instructions=len(trace))
+        if options["stats"]:
+            result["stats"] = vcore.counters.report(vcore)
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+def worker(index, queues, results, pending, closed, options):
+    # Takes jobs from its own queue, then steals from the others in turn; exits once the manifest is
+    # closed and every job has been taken.
+    cache = WarmCache(options["cacheEntries"])
+    victims = [(index + i) % len(queues) for i in range(len(queues))]
+    while True:
+        job = None
+        for victim in victims:
+            try:
+                job = queues[victim].get_nowait()
+                break
+            except queue.Empty:
+                pass
+        if job is None:
+            if closed.is_set() and pending.value == 0:
+                return
+            try:
+                job = queues[index].get(timeout=0.05)
+            except queue.Empty:
+                continue
+        with pending.get_lock():
+            pending.value -= 1
+        result = run_job(job, cache, options)
+        result.update(worker=index, stolen=job["queue"] != index, cacheHits=cache.hits)
+        results.put(result)
+
+def read_manifest(lines, root):
+    # Yields a job dict for every manifest line; relative paths are taken from root.
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        job = json.loads(line) if line.startswith("{") else {"iodir": line}
+        if "iodir" not in job:
+            raise Exception(f"Batch - ERROR: Manifest entry without an iodir: {line}")
+        job["iodir"] = os.path.abspath(os.path.join(root, job["iodir"]))
+        yield job
+
+def run_batch(jobs, out, workers=None, options=None):
+    # Runs every job from the jobs iterable on a pool of warm workers, writing each result to out as a
+    # JSON line as soon as it is done. Returns the number of jobs and of failed jobs.
+    options = dict({"image": False, "jit": False, "eventDriven": False, "dump": True, "dumpMode": "full",
+                    "stats": False, "timeout": 0, "cacheEntries": 64}, **(options or {}))
+    workers = workers or os.cpu_count() or 1
+    queues = [multiprocessing.Queue() for _ in range(workers)]
+    results = multiprocessing.Queue()
+    pending = multiprocessing.Value("i", 0) # Jobs dealt out but not yet taken by a worker.
+    closed = multiprocessing.Event()
+    pool = [multiprocessing.Process(target=worker, args=(i, queues, results, pending, closed, options), daemon=True) for i in range(workers)]
+    for p in pool:
+        p.start()
+
+    submitted = [0]
+    dispatchError = [None] # Raised from run_batch once the jobs already dealt out have finished.
+    def dispatch():
+        try:
+            for job in jobs:
+                job.update(job=submitted[0], queue=submitted[0] % workers)
+                with pending.get_lock():
+                    pending.value += 1
+                queues[job["queue"]].put(job)
+                submitted[0] += 1
+        except Exception as e:
+            dispatchError[0] = e
+        finally:
+            closed.set()
+    dispatcher = threading.Thread(target=dispatch, daemon=True)
+    dispatcher.start()
+
+    done = failed = 0
+    while dispatcher.is_alive() or done < submitted[0]:
+        try:
+            result = results.get(timeout=0.1)
+        except queue.Empty:
+            if not any(p.is_alive() for p in pool):
+                raise Exception(f"Batch - ERROR: Every worker exited with {submitted[0] - done} jobs unfinished")
+            continue
+        done += 1
+        failed += result["error"] is not None
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+    for p in pool:
+        p.join()
+    if dispatchError[0] is not None:
+        raise dispatchError[0]
+    return done, failed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Vector Core Batch Runner')
+    parser.add_argument('manifest', type=str, help='File listing one IO directory (or JSON job object) per line; - reads stdin as it arrives.')
+    parser.add_argument('--workers', default=None, type=int, help='Warm worker processes (default: one per CPU).')
+    parser.add_argument('--out', default="-", type=str, help='JSON-lines results file (default: stdout).')
+    parser.add_argument('--image', action='store_true', help='Load SDMEM/VDMEM from raw int32 images (SDMEM.bin, VDMEM.bin) instead of text.')
+    parser.add_argument('--jit', action='store_true', help='Run the functional simulator on compiled basic blocks.')
+    parser.add_argument('--event-driven', action='store_true', help='Skip idle cycles instead of ticking through them. Cycle counts are unchanged.')
+    parser.add_argument('--stats', action='store_true', help='Add each run\'s performance counters to its result.')
+    parser.add_argument('--no-dump', action='store_true', help='Do not write SRF/VRF/SDMEMOP/VDMEMOP into the IO directories.')
+    parser.add_argument('--dump-mode', default="full", choices=DUMP_MODES, help='How SDMEMOP/VDMEMOP are written.')
+    parser.add_argument('--timeout', default=0, type=int, help='Seconds before a job is reported as an error; 0 disables the limit.')
+    parser.add_argument('--cache-entries', default=64, type=int, help='Programs, configs and memory images each worker keeps parsed.')
+    args = parser.parse_args()
+
+    options = {"image": args.image, "jit": args.jit, "eventDriven": args.event_driven, "dump": not args.no_dump,
+               "dumpMode": args.dump_mode, "stats": args.stats, "timeout": args.timeout, "cacheEntries": args.cache_entries}
+    if args.manifest == "-":
+        jobs = read_manifest(sys.stdin, os.getcwd())
+    else:
+        with open(args.manifest, 'r') as f:
+            jobs = list(read_manifest(f, os.path.dirname(os.path.abspath(args.manifest))))
+
+    start = time.perf_counter()
+    out = sys.stdout if args.out == "-" else open(args.out, 'w')
+    try:
+        done, failed = run_batch(jobs, out, args.workers, options)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"Batch - {done} jobs in {time.perf_counter() - start:.2f}s, {failed} failed", file=sys.stderr)
+    exit(1 if failed else 0)
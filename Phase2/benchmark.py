@@ -0,0 +1,120 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import resource
+import argparse
+import tempfile
+import contextlib
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import func_simulator
+from as16513_ra2466_timingsimulator import Config, IMEM, DMEM, Core
+from memory_system import bank_options
+from workloads import generate, write_program
+
+# Simulator throughput benchmarks. Every benchmark runs in a fresh worker process so peak RSS is its
+# own. The functional simulator's run (without loading inputs or dumping outputs) is timed in dynamic
+# instructions per second, then the timing simulator replays the saved trace and is timed in simulated
+# cycles per second. Results go to JSON so runs on different commits can be compared with --compare.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Synthetic programs: workloads.py kernel and its loop count at scale 1.
+SYNTHETIC = {"long_loop": ("long_loop", 2000), "wide_vectors": ("wide_vectors", 1000), "gather_scatter": ("indexed_loop", 300)}
+PROGRAMS = {"DotProduct": os.path.join(HERE, "DotProduct"), "FullyConnectedLayer": os.path.join(HERE, "FullyConnectedLayer")}
+
+def peak_rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss # bytes on macOS, KB on Linux
+
+def run_benchmark(name, scale=1, eventDriven=False, repeat=1, jit=False):
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    try:
+        if name in PROGRAMS:
+            for f in ["Code.asm", "SDMEM.txt", "VDMEM.txt", "Config.txt"]:
+                shutil.copyfile(os.path.join(PROGRAMS[name], f), os.path.join(workdir, f))
+        else:
+            kernel, iterations = SYNTHETIC[name]
+            workload = generate(kernel, iterations=iterations * scale)
+            write_program(workdir, workload.code, workload.sdmem, workload.vdmem)
+        tracepath = os.path.join(workdir, "trace.bin")
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            funcTimes = []
+            for _ in range(repeat):
+                fcore = func_simulator.Core(func_simulator.IMEM(workdir), func_simulator.DMEM("SDMEM", workdir, 13), func_simulator.DMEM("VDMEM", workdir, 17), jit)
+                start = time.perf_counter()
+                trace = fcore.run()
+                funcTimes.append(time.perf_counter() - start)
+            trace.save(tracepath)
+            funcRss = peak_rss_kb()
+
+            timingTimes = []
+            for _ in range(repeat):
+                config = Config(workdir)
+                vcore = Core(IMEM(workdir), DMEM("SDMEM", workdir, 13), DMEM("VDMEM", workdir, 17, config.vdmNumBanks, **bank_options(config)), config, eventDriven)
+                start = time.perf_counter()
+                vcore.run(tracepath)
+                timingTimes.append(time.perf_counter() - start)
+
+        instructions, cycles = len(trace), vcore.cycles
+        funcSeconds, timingSeconds = min(funcTimes), min(timingTimes)
+        return {"benchmark": name, "scale": scale, "instructions": instructions, "cycles": cycles,
+                "funcSeconds": round(funcSeconds, 4), "instructionsPerSecond": round(instructions / funcSeconds, 1),
+                "timingSeconds": round(timingSeconds, 4), "cyclesPerSecond": round(cycles / timingSeconds, 1),
+                "funcPeakRssKB": funcRss, "peakRssKB": peak_rss_kb()}
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+def run_suite(names, scale=1, eventDriven=False, repeat=1, jit=False):
+    results = []
+    for name in names: # One fresh process per benchmark keeps peak RSS separate.
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            results.append(pool.submit(run_benchmark, name, scale, eventDriven, repeat, jit).result())
+    return {"commit": git_commit(), "python": platform.python_version(), "numpy": np.__version__,
+            "eventDriven": eventDriven, "jit": jit, "results": results}
+
+def compare(report, baseline):
+    # Speedup of each benchmark over a previous report (> 1 is faster).
+    old = {r["benchmark"]: r for r in baseline["results"]}
+    for r in report["results"]:
+        if r["benchmark"] in old:
+            b = old[r["benchmark"]]
+            print(f"{r['benchmark']:20} func x{r['instructionsPerSecond'] / b['instructionsPerSecond']:.2f}  "
+                  f"timing x{r['cyclesPerSecond'] / b['cyclesPerSecond']:.2f}  RSS {b['peakRssKB']} -> {r['peakRssKB']} KB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Vector Core Simulator Benchmarks')
+    parser.add_argument('benchmarks', nargs='*', default=list(PROGRAMS) + list(SYNTHETIC), help=f'Benchmarks to run (default: all of {list(PROGRAMS) + list(SYNTHETIC)}).')
+    parser.add_argument('--scale', default=1, type=int, help='Multiplies the loop count of the synthetic benchmarks.')
+    parser.add_argument('--repeat', default=1, type=int, help='Runs per benchmark; the fastest is reported.')
+    parser.add_argument('--event-driven', action='store_true', help='Time the timing simulator in event-driven mode.')
+    parser.add_argument('--jit', action='store_true', help='Time the functional simulator on compiled basic blocks.')
+    parser.add_argument('--out', default="benchmark.json", type=str, help='Results file.')
+    parser.add_argument('--compare', default=None, type=str, help='Earlier results file to compare against.')
+    args = parser.parse_args()
+
+    report = run_suite(args.benchmarks, args.scale, args.event_driven, args.repeat, args.jit)
+    for r in report["results"]:
+        print(f"{r['benchmark']:20} {r['instructions']:>9} instrs {r['instructionsPerSecond']:>12,.0f} instr/s   "
+              f"{r['cycles']:>10} cycles {r['cyclesPerSecond']:>12,.0f} cycles/s   {r['peakRssKB']:>8} KB")
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print("Benchmark - results written to", os.path.abspath(args.out))
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            compare(report, json.load(f))
@@ -0,0 +1,230 @@
+import functools
+import numpy as np
+
+from decoder import Opcode, REGISTER_FILES
+from dynamic_trace import Segment, Strided
+from finstructions import lrshift, rrshift
+
+# Basic-block compiler for the functional simulator. The program is split at branch targets and after
+# every branch/HALT; a block is compiled into one Python function once it has been entered HOT times, and
+# cached by start PC. Blocks shorter than MIN_LENGTH, and blocks still cold, are interpreted. Every
+# instruction is generated inline with its operands baked in as constants, mirroring finstructions.py.
+#
+# Inside a block, VLR and VMR only change at MTCL and the mask instructions, so the block is cut into
+# Segments right after them. Each Segment is appended to the trace in one step once it has run, and
+# VLR/VMR are reloaded from the Core only at those points.
+#
+# A block function takes the Core and the trace sink (a Trace, or anything with append, appendSegment and
+# len) and returns the next PC. If an instruction raises, the instructions before it are still appended
+# and Core._pc is set to it by the caller, like the interpreter.
+
+HOT = 2
+MIN_LENGTH = 4
+
+BRANCHES = {Opcode.BEQ: "==", Opcode.BNE: "!=", Opcode.BGT: ">", Opcode.BLT: "<", Opcode.BGE: ">=", Opcode.BLE: "<="}
+
+# ADD and SUB wrap inline; the other results always fit in int32.
+SCALAR_OPS = {Opcode.AND: "{} & {}", Opcode.OR: "{} | {}", Opcode.XOR: "{} ^ {}",
+              Opcode.SLL: "lrshift({}, {})", Opcode.SRL: "rrshift({}, {})", Opcode.SRA: "{} >> {}"}
+
+VECTOR_OPS = {Opcode.ADDVV: "add", Opcode.SUBVV: "subtract", Opcode.MULVV: "multiply", Opcode.DIVVV: "floor_divide",
+              Opcode.ADDVS: "add", Opcode.SUBVS: "subtract", Opcode.MULVS: "multiply", Opcode.DIVVS: "floor_divide"}
+
+MASK_OPS = {Opcode.SEQVV: "==", Opcode.SNEVV: "!=", Opcode.SGTVV: ">", Opcode.SLTVV: "<", Opcode.SGEVV: ">=", Opcode.SLEVV: "<=",
+            Opcode.SEQVS: "==", Opcode.SNEVS: "!=", Opcode.SGTVS: ">", Opcode.SLTVS: "<", Opcode.SGEVS: ">=", Opcode.SLEVS: "<="}
+
+# Instructions after which VLR or VMR may differ: each ends a Segment.
+SEGMENT_ENDS = set(MASK_OPS) | {Opcode.CVM, Opcode.MTCL}
+
+ARANGE = np.arange(64, dtype=np.int64)
+
+def where(cache, VMR, VLR):
+    # The where= argument of the masked vector instructions: True, so NumPy skips the mask, while VMR
+    # enables every element. cache holds the last VMR seen and whether it did; VMR arrays are replaced
+    # rather than modified in place, so identity is enough to reuse it.
+    if cache[0] is not VMR:
+        cache[0], cache[1] = VMR, bool(VMR.all())
+    return True if cache[1] else VMR[:VLR]
+
+def find_blocks(program):
+    # {start PC: end PC (exclusive)} of every basic block.
+    leaders = {0}
+    for PC, ins in enumerate(program):
+        if ins.opcode in BRANCHES:
+            leaders.update([PC + ins.imm, PC + 1])
+        elif ins.opcode == Opcode.HALT:
+            leaders.add(PC + 1)
+    leaders = sorted(l for l in leaders if 0 <= l < len(program))
+    return dict(zip(leaders, leaders[1:] + [len(program)]))
+
+def find_segments(program, start, end):
+    # [(start PC, end PC)] of the Segments of block [start, end).
+    cuts = [PC + 1 for PC in range(start, end - 1) if program[PC].opcode in SEGMENT_ENDS]
+    return list(zip([start] + cuts, cuts + [end]))
+
+def instruction_code(ins, access):
+    # Lines running ins; access is the name its memory access is stored under, if it is a memory
+    # instruction. V<i> is the view of vector register i's first VLR elements, W the mask (see where()).
+    op, regs = ins.opcode, ins.regs
+    wrap = "(({}) + 0x80000000 & 0xffffffff) - 0x80000000" # int32(), inline.
+    if op in (Opcode.ADD, Opcode.SUB):
+        return [f"S[{regs[0]}, 0] = " + wrap.format(f"S.item({regs[1]}) {'+' if op == Opcode.ADD else '-'} S.item({regs[2]})")]
+    if op in SCALAR_OPS:
+        return [f"S[{regs[0]}, 0] = " + SCALAR_OPS[op].format(f"S.item({regs[1]})", f"S.item({regs[2]})")]
+    if op in VECTOR_OPS:
+        operand = f"V{regs[2]}" if op.name.endswith("VV") else f"np.int32(S.item({regs[2]}))"
+        compute = f"np.{VECTOR_OPS[op]}(V{regs[1]}, {operand}, out=V{regs[0]}, where=W)"
+        if op not in (Opcode.DIVVV, Opcode.DIVVS):
+            return [compute]
+        return [f"if not {operand}.all():" if op == Opcode.DIVVV else f"if not S.item({regs[2]}):",
+                "    raise ZeroDivisionError('integer division or modulo by zero')",
+                "with np.errstate(over='ignore'):",
+                "    " + compute]
+    if op in MASK_OPS:
+        operand = f"V[{regs[1]}]" if op.name.endswith("VV") else f"S.item({regs[1]})"
+        return [f"core._VMR = V[{regs[0]}] {MASK_OPS[op]} {operand}"]
+    match op:
+        case Opcode.CVM:
+            return ["core._VMR = np.ones(64, dtype=bool)"]
+        case Opcode.POP:
+            return [f"S[{regs[0]}, 0] = int(np.count_nonzero(VMR))"]
+        case Opcode.MTCL:
+            return [f"core._VLR = S.item({regs[0]})"]
+        case Opcode.MFCL:
+            return [f"S[{regs[0]}, 0] = VLR"]
+        case Opcode.LV:
+            return [f"addr = S.item({regs[1]})",
+                    "if not 0 <= addr <= VEND - VLR:",
+                    "    VDMEM.read_block(addr, VLR) # Raises the DMEM error.",
+                    f"np.copyto(V{regs[0]}, VD[addr:addr + VLR], where=W)",
+                    f"{access} = Strided(addr, 1)"]
+        case Opcode.SV:
+            return [f"addr = S.item({regs[1]})",
+                    f"VDMEM.scatter(addr + ARANGE[:VLR], V{regs[0]}, None if W is True else W)",
+                    f"{access} = Strided(addr, 1)"]
+        case Opcode.LVWS:
+            return [f"addr, stride = S.item({regs[1]}), S.item({regs[2]})",
+                    f"np.copyto(V{regs[0]}, VDMEM.read_strided(addr, stride, VLR), where=W)",
+                    f"{access} = Strided(addr, stride)"]
+        case Opcode.SVWS:
+            return [f"addr, stride = S.item({regs[1]}), S.item({regs[2]})",
+                    f"VDMEM.scatter(addr + stride * ARANGE[:VLR], V{regs[0]}, None if W is True else W)",
+                    f"{access} = Strided(addr, stride)"]
+        case Opcode.LVI:
+            return [f"{access} = addresses = S.item({regs[1]}) + V{regs[2]}",
+                    f"np.copyto(V{regs[0]}, VDMEM.gather(addresses), where=W)"]
+        case Opcode.SVI:
+            return [f"{access} = addresses = S.item({regs[1]}) + V{regs[2]}",
+                    f"VDMEM.scatter(addresses, V{regs[0]}, None if W is True else W)"]
+        case Opcode.LS:
+            return [f"addr = S.item({regs[1]}) + {ins.imm}",
+                    f"S[{regs[0]}, 0] = SD[addr] if 0 <= addr < SEND else SDMEM.Read(addr)",
+                    f"{access} = Strided(addr, 0)"]
+        case Opcode.SS:
+            return [f"addr = S.item({regs[1]}) + {ins.imm}",
+                    f"SDMEM.Write(addr, S.item({regs[0]}))",
+                    f"{access} = Strided(addr, 0)"]
+        case Opcode.HALT:
+            return []
+    if op in BRANCHES:
+        return [f"taken = S.item({regs[0]}) {BRANCHES[op]} S.item({regs[1]})"]
+    raise Exception(f"JIT - ERROR: No code for {op.name}")
+
+def compile_block(program, start, end):
+    namespace = {"np": np, "Strided": Strided, "lrshift": lrshift, "rrshift": rrshift, "ARANGE": ARANGE,
+                 "where": where, "MASK": [None, False]}
+    vectors = sorted({r for ins in program[start:end] for k, r in zip(REGISTER_FILES[ins.opcode], ins.regs) if k == "V"})
+    views = ", ".join(f"V{r}" for r in vectors) + " = " + ", ".join(f"V[{r}, :VLR]" for r in vectors) if vectors else "pass"
+    body = ["S, V = core.RFs['SRF'].registers, core.RFs['VRF'].registers",
+            "SDMEM, VDMEM, emit = core.SDMEM, core.VDMEM, sink.appendSegment",
+            "SD, SEND, VD, VEND = SDMEM.data, SDMEM.size, VDMEM.data, VDMEM.size",
+            "VLR, VMR = core._VLR, core._VMR",
+            "W = where(MASK, VMR, VLR)",
+            views]
+    for first, last in find_segments(program, start, end):
+        segment = namespace[f"SEG{first}"] = Segment(program[first:last], first)
+        accesses = [f"A[{j}]" for j in range(len(segment.memory))]
+        if accesses:
+            body.append(f"A = [None] * {len(accesses)}")
+        body += ["n = 0", "try:"]
+        for k, ins in enumerate(segment.instructions):
+            if k:
+                body.append(f"    n = {k}")
+            access = accesses[segment.memory.index(k)] if k in segment.memory else None
+            body += ["    " + line for line in instruction_code(ins, access)]
+        if body[-1] == "try:": # Nothing to run: a lone HALT.
+            body.append("    pass")
+        record = f"emit(SEG{first}, VLR, VMR, {'A' if accesses else '()'}"
+        body += ["except Exception:",
+                 f"    {record}, n)",
+                 "    raise",
+                 record + ")"]
+        if segment.instructions[-1].opcode == Opcode.MTCL:
+            body += ["VLR = core._VLR", "W = where(MASK, VMR, VLR)", views]
+        elif segment.instructions[-1].opcode in SEGMENT_ENDS:
+            body += ["VMR = core._VMR", "W = where(MASK, VMR, VLR)"]
+
+    last = program[end - 1]
+    if last.opcode in BRANCHES:
+        body += ["if taken:",
+                 f"    core._pc = {end - 1 + last.imm}",
+                 f"    return {end - 1 + last.imm}"]
+    following = None if last.opcode == Opcode.HALT else end
+    body += [f"core._pc = {following}", f"return {following}"]
+
+    source = "\n".join([f"def block_{start}(core, sink):"] + ["    " + line for line in body])
+    exec(compiled(source, f"<block {start}-{end - 1}>"), namespace)
+    return namespace[f"block_{start}"]
+
+@functools.lru_cache(maxsize=1024)
+def compiled(source, name): # Code objects are shared by every Core that runs the same block.
+    return compile(source, name, "exec")
+
+class BlockCache(object):
+    # Compiled blocks by start PC, built once a block is hot.
+    def __init__(self, program):
+        self.program = program
+        self.ends = find_blocks(program)
+        self.blocks = {}
+        self.entries = {} # Times each block not compiled yet was entered.
+
+    def get(self, PC): # The compiled block starting at PC, or None to interpret the instruction at PC.
+        block = self.blocks.get(PC)
+        if block is None and PC in self.ends and self.ends[PC] - PC >= MIN_LENGTH:
+            self.entries[PC] = self.entries.get(PC, 0) + 1
+            if self.entries[PC] >= HOT:
+                block = self.blocks[PC] = compile_block(self.program, PC, self.ends[PC])
+        return block
+
+class Records(object):
+    # Trace sink keeping the (instr, PC, VLR, VMR, access) record of each instruction, for Core.stream.
+    # len() counts every record appended, including those already taken out of records.
+    def __init__(self):
+        self.records = []
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, *record):
+        self.records.append(record)
+        self.count += 1
+
+    def appendSegment(self, segment, VLR, VMR, accesses, count=None):
+        records = segment.records(VLR, VMR, accesses, count)
+        self.records += records
+        self.count += len(records)
+
+class Counter(object):
+    # Trace sink that only counts instructions, for Core.advance.
+    def __init__(self):
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, *record):
+        self.count += 1
+
+    def appendSegment(self, segment, VLR, VMR, accesses, count=None):
+        self.count += segment.length if count is None else count
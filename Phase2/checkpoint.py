@@ -0,0 +1,54 @@
+import json
+
+import numpy as np
+
+# Simulator checkpoints. A checkpoint always holds the functional simulator's architectural state after
+# some number of dynamic instructions (func_simulator.Core.saveState): PC, SRF/VRF, VLR/VMR and the
+# DMEM pages written so far, which are applied on top of the same SDMEM/VDMEM inputs when restoring.
+# A checkpoint taken by the timing simulator also holds the timing core's state at the end of a cycle
+# (Core.saveState): fetch/decode, the queues, in-flight instructions, bank busy counters, the
+# scoreboard, chaining state and performance counters. Its dynamic indices are relative to the
+# functional state, so the resumed functional run produces exactly the instructions still to come.
+#
+# The file is a compressed NumPy archive of integer arrays, one per piece of state.
+
+NONE = np.iinfo(np.int64).min # Stands for None in integer state arrays.
+
+class Checkpoint(object):
+    VERSION = 1
+
+    def __init__(self, functional, timing=None, config=None):
+        self.functional = functional # name -> array, from func_simulator.Core.saveState()
+        self.timing = timing # name -> array from the timing Core.saveState(), None if functional only
+        self.config = config # Config.txt parameters of the timing run, which a restored run must match
+
+    @property
+    def instructions(self): # Dynamic instructions executed from the program start.
+        return int(self.functional["executed"])
+
+    @property
+    def cycles(self):
+        return int(self.timing["core"][0]) if self.timing is not None else 0
+
+    def save(self, path):
+        arrays = {"version": np.array(self.VERSION)}
+        arrays.update({"functional." + key: value for key, value in self.functional.items()})
+        if self.timing is not None:
+            arrays.update({"timing." + key: value for key, value in self.timing.items()})
+            arrays["config"] = np.frombuffer(json.dumps(self.config, sort_keys=True).encode(), dtype=np.uint8)
+        with open(path, "wb") as f: # A file object, so NumPy does not append .npz to the path.
+            np.savez_compressed(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as archive:
+            arrays = {key: archive[key] for key in archive.files}
+        if int(arrays.pop("version", -1)) != cls.VERSION:
+            raise Exception(f"Checkpoint - ERROR: {path} is not a version {cls.VERSION} checkpoint file")
+
+        parts = {"functional": {}, "timing": {}}
+        config = json.loads(arrays.pop("config").tobytes().decode()) if "config" in arrays else None
+        for key, value in arrays.items():
+            part, name = key.split(".", 1)
+            parts[part][name] = value
+        return cls(parts["functional"], parts["timing"] or None, config)
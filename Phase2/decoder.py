@@ -0,0 +1,61 @@
+from collections import namedtuple
+from enum import IntEnum
+
+# Assembler/decoder shared by the functional and timing simulators. Code.asm is parsed once into
+# Instruction records so neither simulator splits strings or parses register names while running.
+
+# Operand signature of every instruction: V - vector register, S - scalar register, I - immediate.
+SIGNATURES = {
+    "ADDVV": "VVV", "SUBVV": "VVV", "MULVV": "VVV", "DIVVV": "VVV",
+    "ADDVS": "VVS", "SUBVS": "VVS", "MULVS": "VVS", "DIVVS": "VVS",
+    "SEQVV": "VV", "SNEVV": "VV", "SGTVV": "VV", "SLTVV": "VV", "SGEVV": "VV", "SLEVV": "VV",
+    "SEQVS": "VS", "SNEVS": "VS", "SGTVS": "VS", "SLTVS": "VS", "SGEVS": "VS", "SLEVS": "VS",
+    "CVM": "", "POP": "S", "MTCL": "S", "MFCL": "S",
+    "LV": "VS", "SV": "VS", "LVWS": "VSS", "SVWS": "VSS", "LVI": "VSV", "SVI": "VSV",
+    "LS": "SSI", "SS": "SSI",
+    "ADD": "SSS", "SUB": "SSS", "AND": "SSS", "OR": "SSS", "XOR": "SSS", "SLL": "SSS", "SRL": "SSS", "SRA": "SSS",
+    "BEQ": "SSI", "BNE": "SSI", "BGT": "SSI", "BLT": "SSI", "BGE": "SSI", "BLE": "SSI",
+    "HALT": "",
+}
+
+Opcode = IntEnum("Opcode", list(SIGNATURES), start=0)
+
+MEMORY_OPCODES = {Opcode.LV, Opcode.SV, Opcode.LVWS, Opcode.SVWS, Opcode.LVI, Opcode.SVI, Opcode.LS, Opcode.SS}
+
+# Register operand: file is "S" or "V", idx the register number.
+Register = namedtuple("Register", ["file", "idx"])
+
+# A decoded static instruction.
+#   opcode - Opcode
+#   args   - operands in assembly order: Register for registers, int for immediates
+#   regs   - register numbers in signature order, immediates excluded
+#   imm    - immediate operand, 0 if the instruction has none
+Instruction = namedtuple("Instruction", ["opcode", "args", "regs", "imm"])
+
+# Register files of each opcode's register operands, e.g. ("V", "S") for LV.
+REGISTER_FILES = [tuple(k for k in SIGNATURES[op.name] if k != "I") for op in Opcode]
+
+def decode(text):
+    fields = text.split()
+    if not fields or fields[0] not in SIGNATURES:
+        raise Exception(f"Decoder - ERROR: Invalid instruction: {text}")
+    name, operands = fields[0], fields[1:]
+    signature = SIGNATURES[name]
+    if len(operands) != len(signature):
+        raise Exception(f"Decoder - ERROR: {name} takes {len(signature)} operands: {text}")
+
+    args, regs, imm = [], [], 0
+    for kind, opr in zip(signature, operands):
+        if kind == "I":
+            imm = int(opr)
+            args.append(imm)
+        elif opr[:2] == kind + "R" and opr[2:].isdigit():
+            args.append(Register(kind, int(opr[2:])))
+            regs.append(int(opr[2:]))
+        else:
+            raise Exception(f"Decoder - ERROR: Expected a {kind}R register, got {opr}: {text}")
+    return Instruction(Opcode[name], tuple(args), tuple(regs), imm)
+
+def register_operands(opcode, regs):
+    # Rebuilds Register operands from an opcode and the register numbers stored in a trace.
+    return tuple(Register(k, idx) for k, idx in zip(REGISTER_FILES[opcode], regs))
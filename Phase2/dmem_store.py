@@ -0,0 +1,122 @@
+import os
+import numpy as np
+
+PAGE_BITS = 10 # Dirty tracking granularity: 1024-word pages.
+PAGE_SIZE = 1 << PAGE_BITS
+
+DUMP_MODES = ["full", "sparse", "binary"]
+
+class WordStore(object):
+    # Word-addressable int32 backing store for DMEM.
+    #   - np.zeros leaves untouched pages for the OS to zero-fill on first access.
+    #   - A raw binary image (<name>.bin, little-endian int32) is mapped copy-on-write, so loading it
+    #     costs nothing up front and the image on disk is never modified.
+    #   - Writes mark their page dirty; the first write to a page keeps a copy of its original contents
+    #     so a sparse dump can list just the words that changed.
+    def __init__(self, size, words=None):
+        self.size = size
+        self.words = words if words is not None else np.zeros(size, dtype=np.int32)
+        self.dirty = np.zeros((size + PAGE_SIZE - 1) >> PAGE_BITS, dtype=bool)
+        self._original = {} # page -> contents before its first write
+
+    @classmethod
+    def load(cls, path, size):
+        if path.endswith(".bin"):
+            if os.path.getsize(path) == 4 * size:
+                return cls(size, np.memmap(path, dtype="<i4", mode="c", shape=(size,)))
+            image = np.fromfile(path, dtype="<i4", count=size)
+        else:
+            with open(path, 'r') as ipf:
+                words = ipf.read().split()
+            try:
+                image = np.array(words, dtype=np.int64)
+            except OverflowError:
+                image = None
+            if image is None or (len(image) and (image.min() < -2**31 or image.max() > 2**31 - 1)):
+                raise Exception(f"WordStore - ERROR: {path} holds a word outside the int32 range [{-2**31}, {2**31 - 1}]")
+            image = image.astype(np.int32)
+            if len(image) > size:
+                raise Exception(f"WordStore - ERROR: {path} holds {len(image)} words, more than the memory size {size}")
+
+        store = cls(size)
+        store.words[:len(image)] = image
+        return store
+
+    def read(self, idx):
+        return self.words[idx]
+
+    def write(self, idx, val):
+        page = idx >> PAGE_BITS
+        if not self.dirty[page]:
+            self._touch(page)
+        self.words[idx] = val
+
+    def scatter(self, idx, values): # idx: int array of addresses; a repeated address keeps its last value.
+        for page in np.unique(idx >> PAGE_BITS).tolist():
+            if not self.dirty[page]:
+                self._touch(page)
+        self.words[idx] = values
+
+    def markDirty(self, start, end): # Call before writing words [start, end) without write().
+        for page in range(start >> PAGE_BITS, ((end - 1) >> PAGE_BITS) + 1):
+            if not self.dirty[page]:
+                self._touch(page)
+
+    def _touch(self, page):
+        self._original[page] = np.array(self.words[page << PAGE_BITS:(page + 1) << PAGE_BITS])
+        self.dirty[page] = True
+
+    def dirtyRanges(self): # [start, end) word ranges covering every dirty page, adjacent pages merged.
+        ranges = []
+        for page in np.flatnonzero(self.dirty).tolist():
+            start, end = page << PAGE_BITS, min((page + 1) << PAGE_BITS, self.size)
+            if ranges and ranges[-1][1] == start:
+                ranges[-1][1] = end
+            else:
+                ranges.append([start, end])
+        return [tuple(r) for r in ranges]
+
+    def dirtyPages(self): # (page numbers, their current contents concatenated) of every dirty page.
+        pages = np.flatnonzero(self.dirty)
+        words = [self.words[page << PAGE_BITS:(page + 1) << PAGE_BITS] for page in pages.tolist()]
+        return pages, np.concatenate(words) if words else np.zeros(0, dtype=np.int32)
+
+    def restorePages(self, pages, words): # Writes back the pages saved by dirtyPages() and marks them dirty.
+        offset = 0
+        for page in np.asarray(pages).tolist():
+            start, end = page << PAGE_BITS, min((page + 1) << PAGE_BITS, self.size)
+            self.markDirty(start, end)
+            self.words[start:end] = words[offset:offset + end - start]
+            offset += end - start
+
+    def dumpText(self, path): # One word per line, same format as the input files.
+        with open(path, 'w') as opf:
+            opf.write("\n".join(map(str, self.words.tolist())) + "\n")
+
+    def dumpSparse(self, path): # "<address> <value>" for every word that differs from what was loaded.
+        lines = []
+        for page in np.flatnonzero(self.dirty).tolist():
+            start = page << PAGE_BITS
+            current = self.words[start:start + len(self._original[page])]
+            for offset in np.flatnonzero(current != self._original[page]).tolist():
+                lines.append(f"{start + offset} {current[offset]}\n")
+        with open(path, 'w') as opf:
+            opf.writelines(lines)
+
+    def dumpImage(self, path): # Raw little-endian int32 image that load() maps back in.
+        np.asarray(self.words, dtype="<i4").tofile(path)
+
+    def dump(self, path, mode="full"):
+        # Returns the path written: <path>.txt for full, <path>.diff.txt for sparse, <path>.bin for binary.
+        if mode == "full":
+            path += ".txt"
+            self.dumpText(path)
+        elif mode == "sparse":
+            path += ".diff.txt"
+            self.dumpSparse(path)
+        elif mode == "binary":
+            path += ".bin"
+            self.dumpImage(path)
+        else:
+            raise Exception(f"WordStore - ERROR: Unknown dump mode {mode}, expected one of {DUMP_MODES}")
+        return path
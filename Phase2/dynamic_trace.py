@@ -0,0 +1,402 @@
+import struct
+from collections import deque, namedtuple
+
+import numpy as np
+
+from decoder import Opcode, MEMORY_OPCODES, REGISTER_FILES, register_operands
+
+# A single dynamic instruction as resolved by the functional simulator.
+#   opcode    - Opcode
+#   PC        - static PC of the instruction in Code.asm
+#   operands  - register indices in signature order, immediates excluded
+#   imm       - immediate operand, 0 if the instruction has none
+#   VLR       - vector length in effect when the instruction executed
+#   mask      - VMR in effect when the instruction executed, bit i set if element i is enabled
+#   access    - how the instruction addresses VDMEM/SDMEM, None for non-memory instructions: a Strided
+#               descriptor for LV/SV/LVWS/SVWS/LS/SS, the int32 array of word addresses for LVI/SVI
+class TraceEntry(namedtuple("TraceEntry", ["opcode", "PC", "operands", "imm", "VLR", "mask", "access"])):
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return self.opcode.name
+
+    @property
+    def registers(self): # Register operands, e.g. (Register("V", 1), Register("S", 2)).
+        return register_operands(self.opcode, self.operands)
+
+    @property
+    def addresses(self): # int32 array of the word addresses accessed, in request order.
+        return materialize(self.opcode, self.VLR, self.mask, self.access)
+
+    @property
+    def pattern(self):
+        return access_pattern(self.opcode, self.VLR, self.mask, self.access)
+
+# The fields of a dynamic instruction that are the same every time its static instruction runs, with
+# its Register operands already built: all that decode and issue need. Trace.instructions() shares one
+# per static PC between all of its dynamic instructions.
+class StaticEntry(namedtuple("StaticEntry", ["opcode", "PC", "operands", "imm", "registers"])):
+    __slots__ = ()
+
+    @property
+    def name(self):
+        return self.opcode.name
+
+# Base and stride of a strided access. LV/SV touch base + i for the elements i < VLR enabled in the
+# mask, LVWS/SVWS base + i * stride for all VLR elements, LS/SS just base (stride 0).
+Strided = namedtuple("Strided", ["base", "stride"])
+
+class Segment(object):
+    # Static part of a run of consecutive instructions that all execute with the same VLR and VMR, which
+    # the block JIT appends to a Trace in one step. memory holds the positions of the memory instructions
+    # in the run; their accesses are passed alongside, in the same order.
+    def __init__(self, instructions, start):
+        self.instructions = tuple(instructions)
+        self.start = start
+        self.length = len(self.instructions)
+        self.opcode = np.array([ins.opcode for ins in self.instructions], dtype=np.uint8)
+        self.PC = np.arange(start, start + self.length, dtype=np.int32)
+        self.operands = np.full((self.length, 3), -1, dtype=np.int8)
+        for k, ins in enumerate(self.instructions):
+            self.operands[k, :len(ins.regs)] = ins.regs
+        self.imm = np.array([ins.imm for ins in self.instructions], dtype=np.int32)
+        self.memory = tuple(k for k, ins in enumerate(self.instructions) if ins.opcode in MEMORY_OPCODES)
+
+    def records(self, VLR, VMR, accesses, count=None):
+        # The (instr, PC, VLR, VMR, access) record of each of the first count (default all) instructions.
+        access = dict(zip(self.memory, accesses))
+        return [(ins, self.start + k, VLR, VMR, access.get(k)) for k, ins in enumerate(self.instructions[:count])]
+
+MASKED_OPCODES = {Opcode.LV, Opcode.SV}
+INDEXED_OPCODES = {Opcode.LVI, Opcode.SVI}
+SCALAR_MEMORY_OPCODES = {Opcode.LS, Opcode.SS}
+
+def element_mask(opcode, VLR, mask):
+    # Bit i set if element i sends a request.
+    if opcode in SCALAR_MEMORY_OPCODES:
+        return 1
+    elements = (1 << VLR) - 1
+    return mask & elements if opcode in MASKED_OPCODES else elements
+
+def access_pattern(opcode, VLR, mask, access):
+    # (base, stride, addresses, elements) for generating the requests one at a time: element i goes
+    # to addresses[i] if addresses is not None (LVI/SVI), else to base + i * stride.
+    if isinstance(access, Strided):
+        return int(access.base), int(access.stride), None, element_mask(opcode, VLR, mask)
+    return 0, 0, access.tolist(), (1 << len(access)) - 1
+
+def materialize(opcode, VLR, mask, access):
+    if not isinstance(access, Strided):
+        return access
+    if opcode in SCALAR_MEMORY_OPCODES:
+        return np.array([access.base], dtype=np.int32)
+    addresses = (access.base + access.stride * np.arange(VLR, dtype=np.int64)).astype(np.int32)
+    return addresses[unpack_mask(mask, VLR)] if opcode in MASKED_OPCODES else addresses
+
+def pack_mask(VMR):
+    return int(np.packbits(np.asarray(VMR, dtype=bool), bitorder="little").view(np.uint64)[0])
+
+def unpack_mask(mask, length=64):
+    return np.unpackbits(np.array([mask], dtype=np.uint64).view(np.uint8), bitorder="little")[:length].astype(bool)
+
+class Trace(object):
+    # Columnar (struct-of-arrays) store of the dynamic instruction stream. Every column is a
+    # preallocated NumPy array that doubles when full and is indexed by dynamic PC; VMR snapshots
+    # are deduplicated into a small mask table. Strided accesses are kept as base and stride columns and
+    # their addresses generated on demand; only the LVI/SVI index arrays live in one flat int32 array.
+    #
+    # Trace file layout: a fixed header followed by 8-byte aligned little-endian columns, so every
+    # column can be mapped straight from disk with np.memmap.
+    MAGIC = b"VTRC"
+    VERSION = 3
+    HEADER = struct.Struct("<4sIQQQ") # magic, version, number of entries, masks and indexed addresses
+    COLUMNS = [("opcode", np.uint8, 1), ("PC", np.int32, 1), ("operands", np.int8, 3), ("imm", np.int32, 1),
+               ("VLR", np.int32, 1), ("maskId", np.uint32, 1), ("base", np.int32, 1), ("stride", np.int32, 1)]
+
+    def __init__(self, capacity=1024):
+        self._count = 0
+        self._capacity = capacity
+        self._columns = {name: np.full((capacity, width) if width > 1 else capacity, -1 if name == "operands" else 0, dtype=dtype)
+                         for name, dtype, width in self.COLUMNS}
+        self._addrOffset = np.zeros(capacity + 1, dtype=np.int64) # LVI/SVI entry i's addresses are addressData[addrOffset[i]:addrOffset[i+1]]
+        self._addressData = np.zeros(capacity, dtype=np.int32)
+        self._masks = []
+        self._maskIds = {}
+        self._lastVMR, self._lastMaskId = None, 0
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, idx): # Materializes one TraceEntry; prefer the column accessors in hot loops.
+        if not 0 <= idx < self._count:
+            raise IndexError("Trace index out of range")
+        c = self._columns
+        opcode = Opcode(int(c["opcode"][idx]))
+        nregs = len(REGISTER_FILES[opcode])
+        return TraceEntry(opcode, int(c["PC"][idx]), tuple(int(r) for r in c["operands"][idx][:nregs]), int(c["imm"][idx]),
+                          int(c["VLR"][idx]), self.mask(idx), self.access(idx))
+
+    def __iter__(self):
+        for idx in range(self._count):
+            yield self[idx]
+
+    def available(self, idx): # True if there is a dynamic instruction at idx.
+        return 0 <= idx < self._count
+
+    def instructions(self):
+        # List of the StaticEntry of every entry, read from the columns in bulk.
+        c, PCs = self._columns, self.PC
+        static, first = np.unique(PCs, return_index=True)
+        table = np.empty(int(static[-1]) + 1 if len(static) else 0, dtype=object)
+        for PC, idx in zip(static.tolist(), first.tolist()):
+            opcode = Opcode(int(c["opcode"][idx]))
+            operands = tuple(int(r) for r in c["operands"][idx][:len(REGISTER_FILES[opcode])])
+            table[PC] = StaticEntry(opcode, PC, operands, int(c["imm"][idx]), register_operands(opcode, operands))
+        return table[PCs].tolist()
+
+    @property
+    def opcode(self):
+        return self._columns["opcode"][:self._count]
+
+    @property
+    def PC(self):
+        return self._columns["PC"][:self._count]
+
+    @property
+    def operands(self):
+        return self._columns["operands"][:self._count]
+
+    @property
+    def imm(self):
+        return self._columns["imm"][:self._count]
+
+    @property
+    def VLR(self):
+        return self._columns["VLR"][:self._count]
+
+    @property
+    def maskId(self):
+        return self._columns["maskId"][:self._count]
+
+    @property
+    def base(self): # Base address of strided accesses, 0 for other entries.
+        return self._columns["base"][:self._count]
+
+    @property
+    def stride(self):
+        return self._columns["stride"][:self._count]
+
+    @property
+    def masks(self): # Table of distinct VMR values, indexed by maskId.
+        return np.array(self._masks, dtype=np.uint64)
+
+    @property
+    def addressOffsets(self): # LVI/SVI entry idx's addresses are addressData[addressOffsets[idx]:addressOffsets[idx + 1]].
+        return self._addrOffset[:self._count + 1]
+
+    @property
+    def addressData(self):
+        return self._addressData[:self._addrOffset[self._count]]
+
+    def mask(self, idx):
+        return self._masks[self._columns["maskId"][idx]]
+
+    def access(self, idx): # The TraceEntry access field of entry idx.
+        opcode = Opcode(int(self._columns["opcode"][idx]))
+        if opcode not in MEMORY_OPCODES:
+            return None
+        if opcode in INDEXED_OPCODES:
+            return self._addressData[self._addrOffset[idx]:self._addrOffset[idx + 1]]
+        return Strided(int(self._columns["base"][idx]), int(self._columns["stride"][idx]))
+
+    def addresses(self, idx):
+        return materialize(Opcode(int(self._columns["opcode"][idx])), int(self._columns["VLR"][idx]), self.mask(idx), self.access(idx))
+
+    def accessPattern(self, idx): # See access_pattern().
+        return access_pattern(Opcode(int(self._columns["opcode"][idx])), int(self._columns["VLR"][idx]), self.mask(idx), self.access(idx))
+
+    def append(self, instr, PC, VLR, VMR, access=None): # instr: decoder.Instruction; access as in TraceEntry
+        if self._count == self._capacity:
+            self._grow()
+        idx, c = self._count, self._columns
+
+        c["opcode"][idx] = instr.opcode
+        c["PC"][idx] = PC
+        c["operands"][idx, :len(instr.regs)] = instr.regs
+        c["imm"][idx] = instr.imm
+        c["VLR"][idx] = VLR
+        c["maskId"][idx] = self._maskIdOf(VMR)
+
+        start = self._addrOffset[idx]
+        if isinstance(access, Strided):
+            c["base"][idx], c["stride"][idx] = access
+            self._addrOffset[idx + 1] = start
+        elif access is not None:
+            end = start + len(access)
+            if end > len(self._addressData):
+                self._addressData = self._resized(self._addressData, max(2 * len(self._addressData), end))
+            self._addressData[start:end] = access
+            self._addrOffset[idx + 1] = end
+        else:
+            self._addrOffset[idx + 1] = start
+        self._count += 1
+
+    def appendSegment(self, segment, VLR, VMR, accesses, count=None):
+        # Appends the first count (default all) instructions of a Segment, as append would one at a time.
+        n = segment.length if count is None else count
+        while self._count + n > self._capacity:
+            self._grow()
+        idx, end, c = self._count, self._count + n, self._columns
+
+        c["opcode"][idx:end] = segment.opcode[:n]
+        c["PC"][idx:end] = segment.PC[:n]
+        c["operands"][idx:end] = segment.operands[:n]
+        c["imm"][idx:end] = segment.imm[:n]
+        c["VLR"][idx:end].fill(VLR)
+        c["maskId"][idx:end].fill(self._maskIdOf(VMR))
+
+        offsets = self._addrOffset[idx + 1:end + 1] # offsets[k] ends entry idx + k's addresses.
+        offsets.fill(self._addrOffset[idx])
+        for k, access in zip(segment.memory, accesses):
+            if k >= n:
+                break
+            if isinstance(access, Strided):
+                c["base"][idx + k], c["stride"][idx + k] = access
+            else:
+                start = int(self._addrOffset[idx + k])
+                if start + len(access) > len(self._addressData):
+                    self._addressData = self._resized(self._addressData, max(2 * len(self._addressData), start + len(access)))
+                self._addressData[start:start + len(access)] = access
+                offsets[k:] += len(access)
+        self._count = end
+
+    def _maskIdOf(self, VMR):
+        # VMR arrays are replaced rather than modified in place, so identity is enough to skip re-packing.
+        if VMR is not self._lastVMR:
+            mask = pack_mask(VMR)
+            if mask not in self._maskIds:
+                self._maskIds[mask] = len(self._masks)
+                self._masks.append(mask)
+            self._lastVMR, self._lastMaskId = VMR, self._maskIds[mask]
+        return self._lastMaskId
+
+    @staticmethod
+    def _resized(array, rows, fill=0):
+        grown = np.full((rows,) + array.shape[1:], fill, dtype=array.dtype)
+        grown[:len(array)] = array
+        return grown
+
+    def _grow(self):
+        self._capacity = max(2 * self._capacity, 1024)
+        for name in self._columns:
+            self._columns[name] = self._resized(self._columns[name], self._capacity, -1 if name == "operands" else 0)
+        self._addrOffset = self._resized(self._addrOffset, self._capacity + 1)
+
+    @staticmethod
+    def _layout(count, nmasks, naddr):
+        offset, layout = Trace.HEADER.size, []
+        sections = [(name, dtype, (count, width) if width > 1 else (count,)) for name, dtype, width in Trace.COLUMNS]
+        sections += [("addrOffset", np.int64, (count + 1,)), ("masks", np.uint64, (nmasks,)), ("addressData", np.int32, (naddr,))]
+        for name, dtype, shape in sections:
+            offset = (offset + 7) & ~7
+            layout.append((name, dtype, shape, offset))
+            offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+        return layout
+
+    def save(self, path):
+        count, naddr = self._count, int(self._addrOffset[self._count])
+        sections = {name: self._columns[name][:count] for name, _, _ in self.COLUMNS}
+        sections.update(addrOffset=self._addrOffset[:count + 1], masks=self.masks, addressData=self._addressData[:naddr])
+
+        with open(path, "wb") as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, count, len(self._masks), naddr))
+            for name, dtype, shape, offset in self._layout(count, len(self._masks), naddr):
+                f.write(b"\0" * (offset - f.tell()))
+                f.write(np.ascontiguousarray(sections[name], dtype=dtype).tobytes())
+
+    @classmethod
+    def load(cls, path):
+        # The columns of the returned trace are read-only memory maps of the file.
+        with open(path, "rb") as f:
+            magic, version, count, nmasks, naddr = cls.HEADER.unpack(f.read(cls.HEADER.size))
+        if magic != cls.MAGIC or version != cls.VERSION:
+            raise Exception(f"Trace - ERROR: {path} is not a version {cls.VERSION} trace file")
+
+        sections = {}
+        for name, dtype, shape, offset in cls._layout(count, nmasks, naddr):
+            sections[name] = np.memmap(path, dtype=dtype, mode="r", offset=offset, shape=shape) if shape[0] else np.zeros(shape, dtype=dtype)
+
+        trace = cls(0)
+        trace._count = trace._capacity = count
+        trace._columns = {name: sections[name] for name, _, _ in cls.COLUMNS}
+        trace._addrOffset, trace._addressData = sections["addrOffset"], sections["addressData"]
+        trace._masks = [int(m) for m in sections["masks"]]
+        trace._maskIds = {m: i for i, m in enumerate(trace._masks)}
+        return trace
+
+class StreamingTrace(object):
+    # Trace-like view over a generator of (instr, PC, VLR, VMR, access) records, such as
+    # func_simulator.stream_control_flow. Records are pulled on demand and only the most recent
+    # `window` entries are retained, so memory stays bounded however long the program runs.
+    # inFlight, if given, returns the oldest dynamic index still needed (queued or executing); older
+    # entries are evicted only once they are past it, so the window grows while they are in flight.
+    def __init__(self, records, window, inFlight=None):
+        if window < 1:
+            raise Exception(f"Trace - ERROR: The streaming window must hold at least one instruction, got {window}")
+        self._records = records
+        self._size = window
+        self._inFlight = inFlight
+        self._window = deque([])
+        self._base = 0 # Dynamic index of self._window[0].
+        self._done = False
+        self._lastVMR, self._lastMask = None, 0
+        self.VLR = _WindowColumn(self, "VLR")
+
+    def _pull(self, idx):
+        while not self._done and idx >= self._base + len(self._window):
+            try:
+                instr, PC, VLR, VMR, access = next(self._records)
+            except StopIteration:
+                self._done = True
+                break
+            if VMR is not self._lastVMR:
+                self._lastVMR, self._lastMask = VMR, pack_mask(VMR)
+            if access is not None and not isinstance(access, Strided):
+                access = np.asarray(access, dtype=np.int32)
+            if len(self._window) >= self._size:
+                oldest = self._inFlight() if self._inFlight is not None else self._base + len(self._window)
+                while len(self._window) >= self._size and self._base < oldest:
+                    self._window.popleft()
+                    self._base += 1
+            self._window.append(TraceEntry(instr.opcode, PC, instr.regs, instr.imm, VLR, self._lastMask, access))
+
+    def available(self, idx):
+        self._pull(idx)
+        return 0 <= idx < self._base + len(self._window)
+
+    def __getitem__(self, idx):
+        self._pull(idx)
+        if idx < self._base and idx >= 0:
+            raise IndexError(f"Trace - ERROR: instruction {idx} already left the {self._size} entry streaming window")
+        if not 0 <= idx < self._base + len(self._window):
+            raise IndexError("Trace index out of range")
+        return self._window[idx - self._base]
+
+    def mask(self, idx):
+        return self[idx].mask
+
+    def addresses(self, idx):
+        return self[idx].addresses
+
+    def accessPattern(self, idx):
+        return self[idx].pattern
+
+class _WindowColumn(object):
+    # Lets StreamingTrace be indexed like a Trace column, e.g. trace.VLR[PC].
+    def __init__(self, trace, field):
+        self._trace = trace
+        self._field = field
+
+    def __getitem__(self, idx):
+        return getattr(self._trace[idx], self._field)
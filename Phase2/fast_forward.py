@@ -0,0 +1,190 @@
+from collections import deque
+
+import numpy as np
+
+from decoder import Opcode
+
+# Loop fast-forwarding for the timing core. Every time a backward branch issues, the machine state is
+# captured relative to the branch's dynamic index and the current cycle: fetch/decode position, queue
+# contents, in-flight instructions and their remaining cycles and requests, bank busy counters, the
+# scoreboard and chaining state. Once the state at a branch matches the state q iterations earlier
+# (q up to fastForwardPeriod), the core is periodic with L instructions and D cycles per period. If the
+# trace keeps repeating the same L instructions (static PC, VLR and mask), all but the last repeat are
+# skipped at once: fetch jumps ahead m*L instructions, the clock m*D cycles, and the counters advance
+# by m times their change over the period. Instructions still in flight keep their older dynamic
+# indices; they stand in for the identical instructions m periods later.
+#
+# fastForward = 1 (exact) also requires the VDMEM banks of every address to repeat, for the requests
+# still in flight and the future trace alike, so the skipped cycles are exactly what simulating them
+# would give: the error bound is 0. fastForward = 2 (approximate) ignores the addresses and so also
+# skips loops whose bank pattern drifts, such as gathers. It needs at least two sampled periods and
+# bounds the error by m times the spread of their lengths, assuming the skipped periods stay within
+# the range that was sampled.
+
+VECTOR_MEMORY_OPCODES = [Opcode.LV, Opcode.SV, Opcode.LVWS, Opcode.SVWS, Opcode.LVI, Opcode.SVI]
+STRIDED_VECTOR_OPCODES = [Opcode.LV, Opcode.SV, Opcode.LVWS, Opcode.SVWS]
+BRANCH_OPCODES = {Opcode.BEQ, Opcode.BNE, Opcode.BGT, Opcode.BLT, Opcode.BGE, Opcode.BLE}
+MODES = {1: "exact", 2: "approximate"}
+
+def is_backward_branch(instr):
+    return instr.opcode in BRANCH_OPCODES and instr.imm < 0
+
+class FastForward(object):
+    def __init__(self, mode=1, maxPeriod=8):
+        if mode not in MODES:
+            raise Exception(f"FastForward - ERROR: Unknown fastForward mode {mode}, expected one of {list(MODES)}")
+        self.exact = mode == 1
+        self.maxPeriod = maxPeriod
+        self.history = {} # Static PC of a backward branch -> recent (dynamic index, cycle, signature, counters)
+        self.jumps = []
+
+    def atBranch(self, core, PC):
+        # Called at the end of a cycle in which the backward branch at dynamic index PC issued.
+        trace = core.IMEM.trace
+        history = self.history.setdefault(int(trace.PC[PC]), deque(maxlen=self.maxPeriod))
+        signature, counters = self.signature(core, PC), self.counters(core)
+        for q in range(1, len(history) + 1): # Shortest period first; a longer one may still repeat the banks.
+            start, cycle, previous, before = history[-q]
+            if previous == signature and self.jump(core, PC, history, q, counters):
+                history.clear()
+                return
+        history.append((PC, core.cycles, signature, counters))
+
+    def signature(self, core, PC):
+        bankOf = core.VDMEM.banks.bankOf
+        now = core.cycles
+        producers = {id(readiness): PC - p for p, readiness in core._producers.items()}
+
+        def unit(fu):
+            state = [PC - fu._PC, fu.numCycles, fu._flag, fu._ocf]
+            if fu.instr.opcode in VECTOR_MEMORY_OPCODES:
+                if self.exact:
+                    state += [tuple(None if a is None else bankOf(a) for a in fu.lanes), tuple(bankOf(a) for a in fu.pendingAddresses())]
+                else:
+                    state += [tuple(a is None for a in fu.lanes), fu.remaining()]
+            if fu._chain is not None:
+                state += [fu._taken, tuple(fu._positions)]
+            if fu.chainedFrom is not None:
+                state += [fu._groups, tuple(producers.get(id(r)) for r in fu.chainedFrom)]
+            return tuple(state)
+
+        units = tuple((u.blocked, tuple(unit(fu) for fu in u.active)) for pool in core._EXFront.values() for u in pool.units)
+        queues = tuple(tuple(PC - entry[1] for entry in queue) for queue in core._queues.values())
+        banks = core.VDMEM.banks
+        sb = core.scoreboard
+        scoreboard = (sb.busy, sb.reading, tuple(sb._writers), tuple(sb._readers),
+                      tuple(PC - w if w in core._producers else None for w in sb.writer))
+        chaining = (tuple(sorted((PC - p, tuple(r - now if r != float("inf") else None for r in e.readyAt), e._prefix) for p, e in core._producers.items())),
+                    tuple(sorted((PC - p, tuple(producers.get(id(r)) for r in rs)) for p, rs in core._chains.items())))
+        decoded = None if core.decoded[1] is None else (core.decoded[0] is None, core.decoded[1] - PC)
+        return (core.PC - PC, decoded, core.STALL, core.stallReason, queues, units, tuple(banks.bb),
+                tuple(len(q) for q in banks.queues), scoreboard, chaining)
+
+    @staticmethod
+    def _cells(core):
+        # Every counter that grows with simulated time, as (container, key) pairs.
+        c, banks = core.counters, core.VDMEM.banks
+        cells = [(c, "issued"), (c, "vlsCycles"), (c, "laneRequests"), (banks, "stallCycles")]
+        cells += [(c.decodeStalls, k) for k in c.decodeStalls] + [(c.queueDepthSum, k) for k in c.queueDepthSum]
+        cells += [(banks.accesses, i) for i in range(banks.numBanks)] + [(banks.conflicts, i) for i in range(banks.numBanks)]
+        cells += [(u, attr) for pool in core._EXFront.values() for u in pool.units for attr in ["busyCycles", "occupancySum"]]
+        if core.vlsModel is not None:
+            cells += [(core.vlsModel.stats, k) for k in core.vlsModel.stats]
+        return cells
+
+    def counters(self, core):
+        return [obj[key] if isinstance(obj, (dict, list)) else getattr(obj, key) for obj, key in self._cells(core)]
+
+    def _firstMismatch(self, trace, lo, hi, period, banks):
+        # First index in [lo, hi) whose entry differs from the one period earlier, or None.
+        diff = np.zeros(hi - lo, dtype=bool)
+        for column in (trace.PC, trace.VLR, trace.maskId):
+            diff |= column[lo:hi] != column[lo - period:hi - period]
+        end = lo + int(np.argmax(diff)) if diff.any() else hi
+        if banks is not None and end > lo:
+            # Entries up to end have the same static instruction, VLR and mask as their counterparts.
+            # LVI/SVI address lists line up, so their banks are compared directly.
+            offsets, data = trace.addressOffsets, trace.addressData
+            a0, a1, b0 = int(offsets[lo]), int(offsets[end]), int(offsets[lo - period])
+            x, y = data[a0:a1].astype(np.int64), data[b0:b0 + a1 - a0].astype(np.int64)
+            differs = np.flatnonzero(banks.bankOf(x) != banks.bankOf(y))
+            if len(differs):
+                end = int(np.searchsorted(offsets, a0 + differs[0], side="right")) - 1
+            # A strided access with the same stride and a base a whole bank period further on hits the
+            # same banks; the remaining strided ones have their addresses generated and compared.
+            strided = np.isin(trace.opcode[lo:end], STRIDED_VECTOR_OPCODES)
+            stride, base = trace.stride, trace.base.astype(np.int64)
+            same = stride[lo:end] == stride[lo - period:end - period]
+            if banks.period is not None:
+                same &= (base[lo:end] - base[lo - period:end - period]) % banks.period == 0
+            else:
+                same[:] = False
+            for idx in (lo + np.flatnonzero(strided & ~same)).tolist():
+                x, y = trace.addresses(idx).astype(np.int64), trace.addresses(idx - period).astype(np.int64)
+                if np.any(banks.bankOf(x) != banks.bankOf(y)):
+                    end = idx
+                    break
+        return end if end < hi else None
+
+    def repeatsUntil(self, trace, start, period, banks=None):
+        # First dynamic index >= start whose entry differs from the one period earlier (len(trace) if none).
+        n, step = len(trace), max(4 * period, 1024)
+        while start < n:
+            end = min(n, start + step)
+            mismatch = self._firstMismatch(trace, start, end, period, banks)
+            if mismatch is not None:
+                return mismatch
+            start, step = end, 2 * step
+        return n
+
+    def jump(self, core, PC, history, iterations, after):
+        trace = core.IMEM.trace
+        start, cycle, _, before = history[-iterations]
+        period, cycles = PC - start, core.cycles - cycle
+        # Cycles of each sampled period: spans of the history holding exactly one period of instructions,
+        # which leaves out spans reaching back into an earlier run of the loop.
+        sampled = [h[:2] for h in history] + [(PC, core.cycles)]
+        spans = [sampled[i][1] - sampled[i - iterations][1] for i in range(iterations, len(sampled))
+                 if sampled[i][0] - sampled[i - iterations][0] == period]
+        if not self.exact and len(spans) < 2:
+            return False
+        # The oldest instruction still queued or in flight; everything from it on must repeat.
+        oldest = min([PC + 1] + [entry[1] for queue in core._queues.values() for entry in queue] +
+                     [fu._PC for pool in core._EXFront.values() for u in pool.units for fu in u.active])
+        if oldest - period < 0:
+            return False
+        end = self.repeatsUntil(trace, oldest, period, core.VDMEM.banks if self.exact else None)
+        m = (end - (PC + 1)) // period - 1 # Keep one repeat for the loop exit and fetch lookahead.
+        if m < 1:
+            return False
+
+        skipped = m * period
+        core.cycles += m * cycles
+        core.PC += skipped
+        if core.decoded[1] is not None:
+            idx = core.decoded[1] + skipped
+            core.decoded = (None if core.decoded[0] is None else core.IMEM[idx], idx)
+        for readiness in core._producers.values():
+            readiness.readyAt = [r + m * cycles for r in readiness.readyAt]
+        for pool in core._EXFront.values(): # Estimates of request phases in flight no longer line up with the clock.
+            for u in pool.units:
+                for fu in u.active:
+                    fu._estimate = None
+        for (obj, key), b, a in zip(self._cells(core), before, after):
+            if isinstance(obj, (dict, list)):
+                obj[key] += m * (a - b)
+            else:
+                setattr(obj, key, getattr(obj, key) + m * (a - b))
+
+        bound = 0 if self.exact else m * (max(spans) - min(spans))
+        self.jumps.append({"branch": int(trace.PC[PC]), "cycle": core.cycles - m * cycles, "iterations": m * iterations,
+                           "instructions": skipped, "cycles": m * cycles, "errorBound": bound})
+        return True
+
+    def report(self):
+        return {"mode": "exact" if self.exact else "approximate",
+                "loops": len(self.jumps),
+                "instructions": sum(j["instructions"] for j in self.jumps),
+                "cycles": sum(j["cycles"] for j in self.jumps),
+                "errorBound": sum(j["errorBound"] for j in self.jumps),
+                "jumps": self.jumps}
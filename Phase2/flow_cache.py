@@ -0,0 +1,88 @@
+import os
+import shutil
+import hashlib
+import tempfile
+
+from dynamic_trace import Trace
+
+# On-disk cache of functional simulation results. An entry is keyed by the program, its input data,
+# the functional simulator's own source and the output options, and holds the resolved trace plus
+# the files the run wrote (SRF.txt, VRF.txt, SDMEMOP*, VDMEMOP*). Entries are evicted least recently
+# used first once the cache grows past its size limit.
+
+DEFAULT_DIR = os.environ.get("VMIPS_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "vmips-sim"))
+DEFAULT_MAX_BYTES = 1 << 30
+
+SIMULATOR_SOURCES = ["func_simulator.py", "finstructions.py", "decoder.py", "dynamic_trace.py", "dmem_store.py", "block_jit.py"]
+
+class FlowCache(object):
+    def __init__(self, root=DEFAULT_DIR, maxBytes=DEFAULT_MAX_BYTES):
+        self.root = os.path.abspath(root)
+        self.maxBytes = maxBytes
+        os.makedirs(self.root, exist_ok=True)
+
+    def key(self, iodir, image=False, dumpMode="full"):
+        h = hashlib.sha256(f"image={image} dumpMode={dumpMode}\n".encode())
+        here = os.path.dirname(os.path.abspath(__file__))
+        inputs = [os.path.join(iodir, name) for name in ["Code.asm", "SDMEM" + (".bin" if image else ".txt"), "VDMEM" + (".bin" if image else ".txt")]]
+        for path in inputs + [os.path.join(here, src) for src in SIMULATOR_SOURCES]:
+            h.update(os.path.basename(path).encode() + b"\0")
+            if not os.path.exists(path):
+                h.update(b"<missing>")
+                continue
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    h.update(chunk)
+        return h.hexdigest()
+
+    def _entry(self, key):
+        return os.path.join(self.root, key)
+
+    def lookup(self, key, iodir):
+        # On a hit, restores the cached output files into iodir and returns the memory-mapped trace.
+        entry = self._entry(key)
+        tracepath = os.path.join(entry, "trace.bin")
+        if not os.path.exists(tracepath):
+            return None
+        os.utime(entry) # Directory mtime doubles as the LRU timestamp.
+        for name in os.listdir(entry):
+            if name != "trace.bin":
+                shutil.copyfile(os.path.join(entry, name), os.path.join(iodir, name))
+        return Trace.load(tracepath)
+
+    def store(self, key, trace, outputs):
+        entry = self._entry(key)
+        if os.path.exists(entry):
+            return
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=self.root)
+        try:
+            trace.save(os.path.join(tmp, "trace.bin"))
+            for path in outputs:
+                shutil.copyfile(path, os.path.join(tmp, os.path.basename(path)))
+            os.replace(tmp, entry) # Atomic, so concurrent runs never see half-written entries.
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if not os.path.exists(entry):
+                raise
+        self.evict()
+
+    def size(self, entry):
+        return sum(os.path.getsize(os.path.join(entry, name)) for name in os.listdir(entry))
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if name.startswith(".tmp-") or not os.path.isdir(path):
+                continue
+            entries.append((os.path.getmtime(path), self.size(path), path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.maxBytes:
+                break
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+        os.makedirs(self.root, exist_ok=True)
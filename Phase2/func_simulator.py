@@ -1,7 +1,14 @@
 import os
 import argparse
+import itertools
+import numpy as np
 
 from finstructions import INSTRUCTION_SET
+from decoder import Opcode, decode
+from dynamic_trace import Trace
+from dmem_store import WordStore, DUMP_MODES
+from block_jit import BlockCache, Counter, Records
+from checkpoint import Checkpoint
 
 class IMEM(object):
     def __init__(self, iodir):
@@ -18,31 +25,40 @@ class IMEM(object):
         except:
             print(f"IMEM - ERROR: Couldn't open file in path:{self.filepath}")
 
+        self.program = [decode(ins) for ins in self.instructions] # Decoded once, executed many times.
+
     def Read(self, idx): # Use this to read from IMEM.
         if idx < self.size:
             return self.instructions[idx]
         else:
             print(f"IMEM - ERROR: Invalid memory access at index: {idx} with memory size: {self.size}")
 
+    def Decoded(self, idx): # Same as Read, but returns the decoder.Instruction.
+        if idx < self.size:
+            return self.program[idx]
+        else:
+            print(f"IMEM - ERROR: Invalid memory access at index: {idx} with memory size: {self.size}")
+
 class DMEM(object):
     # Word addressible - each address contains 32 bits.
-    def __init__(self, name, iodir, addressLen):
+    def __init__(self, name, iodir, addressLen, image=False, store=None):
         self.name = name
         self.size = pow(2, addressLen)
         self.min_value  = -pow(2, 31)
         self.max_value  = pow(2, 31) - 1
-        self.ipfilepath = os.path.abspath(os.path.join(iodir, name + ".txt"))
+        self.ipfilepath = os.path.abspath(os.path.join(iodir, name + (".bin" if image else ".txt"))) # image: raw int32 binary input
         self.opfilepath = os.path.abspath(os.path.join(iodir, name + "OP.txt"))
-        self.data = []
+        self.store = WordStore(self.size) if store is None else store # store: contents already loaded from ipfilepath
+        self.data = self.store.words
 
+        if store is not None:
+            return
         try:
-            with open(self.ipfilepath, 'r') as ipf:
-                self.data = [int(line.strip()) for line in ipf.readlines()]
-                
+            self.store = WordStore.load(self.ipfilepath, self.size)
+            self.data = self.store.words
             print(f"{self.name} - Data loaded from file:          {self.ipfilepath}")
             # print(self.name, "- Data:", self.data)
-            self.data.extend([0x0 for i in range(self.size - len(self.data))])
-        except:
+        except OSError:
             print(f"{self.name}- ERROR: Couldn't open input file in path:{self.ipfilepath}")
 
     def Read(self, idx): # Use this to read from DMEM.
@@ -53,16 +69,53 @@ class DMEM(object):
 
     def Write(self, idx, val): # Use this to write into DMEM.
         if 0 <= idx < self.size:
-            self.data[idx] = val
+            self.store.write(idx, val)
         else:
             raise Exception(f"DMEM - ERROR: Invalid memory access at index: {idx} with memory size: {self.size}")
 
-    def dump(self):
+    # Bulk accesses for the vector memory instructions. Each checks all its addresses at once and raises
+    # the same error as Read/Write for the first one out of range.
+
+    def _invalid(self, idx):
+        raise Exception(f"DMEM - ERROR: Invalid memory access at index: {idx} with memory size: {self.size}")
+
+    def _check(self, idx): # idx: int array of addresses.
+        bad = (idx < 0) | (idx >= self.size)
+        if bad.any():
+            self._invalid(idx[np.argmax(bad)])
+
+    def read_block(self, start, count): # Words [start, start + count).
+        if count > 0 and (start < 0 or start + count > self.size):
+            self._invalid(start if start < 0 else max(start, self.size))
+        return np.array(self.data[start:start + count])
+
+    def read_strided(self, start, stride, count): # Words start, start + stride, ... (count of them).
+        idx = start + stride * np.arange(count, dtype=np.int64)
+        if count > 0 and not (0 <= idx[0] < self.size and 0 <= idx[-1] < self.size): # Both ends in range: all are.
+            self._check(idx)
+        return self.data[idx]
+
+    def gather(self, idx): # Words at each address of idx.
+        self._check(idx)
+        return self.data[idx]
+
+    def scatter(self, idx, values, mask=None):
+        # Writes values[i] to idx[i] for every i enabled in mask, as if one at a time in order: a
+        # repeated address keeps the later value, and the writes before an invalid address happen.
+        if mask is not None:
+            idx, values = idx[mask], values[mask]
+        bad = (idx < 0) | (idx >= self.size)
+        if bad.any():
+            first = int(np.argmax(bad))
+            self.store.scatter(idx[:first], values[:first])
+            self._invalid(idx[first])
+        self.store.scatter(idx, values)
+
+    def dump(self, mode="full"): # mode: "full" text dump, "sparse" changed words only, "binary" raw image.
         try:
-            with open(self.opfilepath, 'w') as opf:
-                lines = [str(data) + '\n' for data in self.data]
-                opf.writelines(lines)
-            print(self.name, "- Dumped data into output file in path:", self.opfilepath)
+            path = self.store.dump(self.opfilepath[:-len(".txt")], mode)
+            print(self.name, "- Dumped data into output file in path:", path)
+            return path
         except:
             print(self.name, "- ERROR: Couldn't open output file in path:", self.opfilepath)
 
@@ -74,9 +127,9 @@ class RegisterFile(object):
         self.reg_bits   = size
         self.min_value  = -pow(2, self.reg_bits-1)
         self.max_value  = pow(2, self.reg_bits-1) - 1
-        self.registers  = [[0x0 for e in range(self.vec_length)] for r in range(self.reg_count)] # list of lists of integers
+        self.registers  = np.zeros((self.reg_count, self.vec_length), dtype=np.int32) # one int32 row per register
 
-    def Read(self, idx):
+    def Read(self, idx): # Returns a view of the register row, not a copy.
         try:
             return self.registers[idx]
         except IndexError:
@@ -85,9 +138,7 @@ class RegisterFile(object):
     def Write(self, idx, val):
         # print(f"Write -  idx: {idx}   val: {val}")
         try:
-            register = self.registers[idx]
-            for i, v in enumerate(val):
-                register[i] = v
+            self.registers[idx, :len(val)] = val
         except IndexError:
             raise Exception("Invalid register write.")
 
@@ -100,11 +151,12 @@ class RegisterFile(object):
                 lines += [row_format.format(*[str(val) for val in data]) + "\n" for data in self.registers]
                 opf.writelines(lines)
             print(self.name, "- Dumped data into output file in path:", opfilepath)
+            return opfilepath
         except:
             print(self.name, "- ERROR: Couldn't open output file in path:", opfilepath)
 
 class Core():
-    def __init__(self, imem, sdmem, vdmem):
+    def __init__(self, imem, sdmem, vdmem, jit=False):
         self.IMEM = imem
         self.SDMEM = sdmem
         self.VDMEM = vdmem
@@ -112,42 +164,102 @@ class Core():
         self.RFs = {"SRF": RegisterFile("SRF", 8),
                     "VRF": RegisterFile("VRF", 8, 64)}
         
-        self._VMR = [1 for _ in range(64)]
+        self._VMR = np.ones(64, dtype=bool)
         self._VLR = 64
 
-        self.__ISET = INSTRUCTION_SET
+        self.__ISET = [INSTRUCTION_SET[op.name] for op in Opcode] # Indexed by opcode.
         self._pc = 0
+        self._blocks = BlockCache(imem.program) if jit else None # jit: run compiled basic blocks.
+        self.executed = 0 # Dynamic instructions executed by run() and advance(), counted from the program start.
         
-    def run(self):
-        resolved_flow = []
-        dynamicState = []
+    def run(self, limit=None, trace=None):
+        # Executes up to limit dynamic instructions (all if None), appending them to trace.
+        trace = Trace() if trace is None else trace
+        start = len(trace)
         try:
-            for INS, OPR in self.__exec:
-
-                if OPR:
-                    resolved_flow.append(self[INS](self, *OPR))
-                    dynamicState.append({
-                        "I": [INS] + OPR,
-                        "PC": self._pc,
-                        "VMR": self._VMR,
-                        "VLR": self._VLR
-                    })
-                else:
-                    resolved_flow.append(self[INS](self))
-                    dynamicState.append({
-                        "I": [INS],
-                        "PC": self._pc,
-                        "VMR": self._VMR,
-                        "VLR": self._VLR
-                    })
+            if self._blocks is not None:
+                self._run_blocks(trace, stop=None if limit is None else start + limit)
+            else:
+                for record in self.stream(limit):
+                    trace.append(*record)
         except ValueError as err:
-            print(INS, OPR)
-            return resolved_flow
-        return resolved_flow, dynamicState
+            print(f"{self.IMEM.Read(self._pc)}: {err}")
+        self.executed += len(trace) - start
+        return trace
+
+    def advance(self, n):
+        # Executes up to n dynamic instructions without recording them; returns how many ran.
+        counter = Counter()
+        if self._blocks is not None:
+            self._run_blocks(counter, stop=n)
+        else:
+            for record in self.stream(n):
+                counter.append(*record)
+        self.executed += len(counter)
+        return len(counter)
+
+    def saveState(self):
+        # Architectural state for a checkpoint: PC, registers, VLR/VMR and the dirty DMEM pages.
+        state = {"executed": np.array(self.executed), "pc": np.array(-1 if self._pc is None else self._pc),
+                 "VLR": np.array(self._VLR), "VMR": self._VMR.copy(),
+                 "SRF": self.RFs["SRF"].registers.copy(), "VRF": self.RFs["VRF"].registers.copy()}
+        for mem in [self.SDMEM, self.VDMEM]:
+            state[mem.name + ".pages"], state[mem.name + ".words"] = mem.store.dirtyPages()
+        return state
+
+    def loadState(self, state): # Restores saveState() on a core whose DMEMs were loaded from the same inputs.
+        self.executed = int(state["executed"])
+        self._pc = None if int(state["pc"]) < 0 else int(state["pc"])
+        self._VLR = int(state["VLR"])
+        self._VMR = np.array(state["VMR"], dtype=bool) # A new array: VMR is replaced, never modified in place.
+        self.RFs["SRF"].registers[:] = state["SRF"]
+        self.RFs["VRF"].registers[:] = state["VRF"]
+        for mem in [self.SDMEM, self.VDMEM]:
+            mem.store.restorePages(state[mem.name + ".pages"], state[mem.name + ".words"])
+
+    def stream(self, limit=None):
+        # Executes the program lazily, yielding (instr, PC, VLR, VMR, addresses) for each dynamic
+        # instruction, up to limit instructions if given.
+        if self._blocks is not None:
+            sink = Records()
+            while self._pc is not None and (limit is None or len(sink) < limit):
+                error = None
+                try:
+                    self._run_blocks(sink, 1, limit)
+                except Exception as e:
+                    error = e
+                yield from sink.records # Whatever the block executed before an instruction raised.
+                sink.records.clear()
+                if error is not None:
+                    raise error
+            return
+        for ins in itertools.islice(self.__exec, limit):
+            PC, VLR, VMR = self._pc, self._VLR, self._VMR
+            addresses = self[ins.opcode](self, *ins.args)
+            yield ins, PC, VLR, VMR, addresses
+
+    def _run_blocks(self, sink, limit=None, stop=None):
+        # Runs up to limit basic blocks, appending each executed instruction to sink (see block_jit), and
+        # stops once len(sink) reaches stop. A PC with no compiled block (cold or short blocks, or a PC only
+        # reachable through a branch out of the program), or a block that would run past stop, is
+        # interpreted one instruction at a time.
+        while self._pc is not None and limit != 0 and (stop is None or len(sink) < stop):
+            if limit is not None:
+                limit -= 1
+            block = self._blocks.get(self._pc)
+            if block is None or (stop is not None and len(sink) + self._blocks.ends[self._pc] - self._pc > stop):
+                ins, PC, VLR, VMR = self.IMEM.Decoded(self._pc), self._pc, self._VLR, self._VMR
+                sink.append(ins, PC, VLR, VMR, self[ins.opcode](self, *ins.args))
+                continue
+            start, done = self._pc, len(sink)
+            try:
+                block(self, sink)
+            except Exception:
+                self._pc = start + len(sink) - done # The instruction that raised.
+                raise
 
     def dumpregs(self, iodir):
-        for rf in self.RFs.values():
-            rf.dump(iodir)
+        return [rf.dump(iodir) for rf in self.RFs.values()]
 
     def _update_pc(self, i=1, _set=False):
         if _set:
@@ -156,46 +268,75 @@ class Core():
             self._pc += i
         return self._pc
 
-    def _register_read(self, R):
+    def _register_read(self, R): # R: decoder.Register
         if R[0] == "S":
-            return self.RFs["SRF"].Read(int(R[2:]))[0]
+            return int(self.RFs["SRF"].Read(R[1])[0])
         elif R[0] == "V":
-            return self.RFs["VRF"].Read(int(R[2:]))
+            return self.RFs["VRF"].Read(R[1])
 
     def _register_write(self, R, val):
         if R[0] == "S":
-            self.RFs["SRF"].Write(int(R[2:]), [val])
+            self.RFs["SRF"].Write(R[1], [val])
         elif R[0] == "V":
-            self.RFs["VRF"].Write(int(R[2:]), val)
+            self.RFs["VRF"].Write(R[1], val)
 
     @property
     def __exec(self):
         while self._pc is not None:
-            ins = self.IMEM.Read(self._pc).split(" ")
-            opr = ins[1:] if len(ins) > 1 else None
-            yield (ins[0], opr)
+            yield self.IMEM.Decoded(self._pc)
 
-    def __getitem__(self, name):
-        try:
-            return self.__ISET[name]
-        except KeyError:
-            print("Invalid instruction (core dumped)", name)
-
-def get_control_flow(iodir):
-    imem = IMEM(iodir)
-    sdmem = DMEM("SDMEM", iodir, 13)
-    vdmem = DMEM("VDMEM", iodir, 17)
-    vcore = Core(imem, sdmem, vdmem)
-    r = vcore.run()
-    vcore.dumpregs(iodir)
-    sdmem.dump()
-    vdmem.dump()
+    def __getitem__(self, opcode):
+        return self.__ISET[opcode]
+
+def load_core(iodir, image=False, jit=False, checkpoint=None):
+    # A Core on iodir's program and data, resumed from checkpoint (a checkpoint.Checkpoint) if given.
+    vcore = Core(IMEM(iodir), DMEM("SDMEM", iodir, 13, image), DMEM("VDMEM", iodir, 17, image), jit)
+    if checkpoint is not None:
+        vcore.loadState(checkpoint.functional)
+    return vcore
+
+def get_control_flow(iodir, image=False, dumpMode="full", cache=None, jit=False, checkpoint=None, limit=None):
+    # cache: optional flow_cache.FlowCache; a hit skips the simulation and restores its output files.
+    # checkpoint: checkpoint.Checkpoint to resume from; limit: dynamic instructions to run at most.
+    if checkpoint is not None or limit is not None:
+        cache = None # Cached results cover whole runs from the program start.
+    if cache is not None:
+        key = cache.key(iodir, image, dumpMode)
+        trace = cache.lookup(key, iodir)
+        if trace is not None:
+            print(f"Cache  - Reusing functional simulation results:  {cache.root}/{key[:12]}")
+            return trace
+
+    vcore = load_core(iodir, image, jit, checkpoint)
+    r = vcore.run(limit)
+    outputs = vcore.dumpregs(iodir)
+    outputs += [vcore.SDMEM.dump(dumpMode), vcore.VDMEM.dump(dumpMode)]
+
+    if cache is not None and None not in outputs:
+        cache.store(key, r, outputs)
     return r
 
+def stream_control_flow(iodir, image=False, dumpMode="full", jit=False, checkpoint=None, limit=None):
+    # Generator version of get_control_flow: yields trace records as they are executed and writes the
+    # output files once the program halts.
+    vcore = load_core(iodir, image, jit, checkpoint)
+    yield from vcore.stream(limit)
+    vcore.dumpregs(iodir)
+    vcore.SDMEM.dump(dumpMode)
+    vcore.VDMEM.dump(dumpMode)
+
 if __name__ == "__main__":
     #parse arguments for input file location
     parser = argparse.ArgumentParser(description='Vector Core Performance Model')
     parser.add_argument('--iodir', default="", type=str, help='Path to the folder containing the input files - instructions and data.')
+    parser.add_argument('--trace', default=None, type=str, help='Write the resolved dynamic trace to this file.')
+    parser.add_argument('--image', action='store_true', help='Load SDMEM/VDMEM from raw int32 images (SDMEM.bin, VDMEM.bin) instead of text.')
+    parser.add_argument('--dump-mode', default="full", choices=DUMP_MODES, help='full: every word as text, sparse: only changed words, binary: raw int32 image.')
+    parser.add_argument('--jit', action='store_true', help='Compile basic blocks into Python functions on first use instead of interpreting every instruction.')
+    parser.add_argument('--restore', default=None, type=str, help='Resume from a checkpoint file instead of the program start.')
+    parser.add_argument('--checkpoint', default="checkpoint-{}.ckpt", type=str, help='Checkpoint file written by --checkpoint-at; {} is replaced by the instruction count.')
+    parser.add_argument('--checkpoint-at', default=[], type=int, nargs='+', help='Write a checkpoint after this many dynamic instructions from the program start.')
+    parser.add_argument('--max-instructions', default=None, type=int, help='Stop after this many dynamic instructions.')
     args = parser.parse_args()
 
     iodir = os.path.abspath(args.iodir)
@@ -204,18 +345,35 @@ if __name__ == "__main__":
     # Parse IMEM
     imem = IMEM(iodir)  
     # Parse SMEM
-    sdmem = DMEM("SDMEM", iodir, 13) # 32 KB is 2^15 bytes = 2^13 K 32-bit words.
+    sdmem = DMEM("SDMEM", iodir, 13, args.image) # 32 KB is 2^15 bytes = 2^13 K 32-bit words.
     # Parse VMEM
-    vdmem = DMEM("VDMEM", iodir, 17) # 512 KB is 2^19 bytes = 2^17 K 32-bit words. 
+    vdmem = DMEM("VDMEM", iodir, 17, args.image) # 512 KB is 2^19 bytes = 2^17 K 32-bit words. 
 
     # Create Vector Core
-    vcore = Core(imem, sdmem, vdmem)
+    vcore = Core(imem, sdmem, vdmem, args.jit)
+    if args.restore:
+        vcore.loadState(Checkpoint.load(args.restore).functional)
+        print(f"Checkpoint - Resuming after {vcore.executed} instructions from: {os.path.abspath(args.restore)}")
 
     # Run Core
-    vcore.run()   
+    trace = Trace()
+    stop = None if args.max_instructions is None else vcore.executed + args.max_instructions
+    for n in sorted(args.checkpoint_at):
+        if n < vcore.executed or (stop is not None and n > stop):
+            continue
+        vcore.run(n - vcore.executed, trace)
+        if vcore.executed < n:
+            print(f"Checkpoint - Program halted after {vcore.executed} instructions, before {n}")
+            break
+        path = args.checkpoint.format(n)
+        Checkpoint(vcore.saveState()).save(path)
+        print(f"Checkpoint - State after {n} instructions written to: {os.path.abspath(path)}")
+    vcore.run(None if stop is None else stop - vcore.executed, trace)
     vcore.dumpregs(iodir)
+    if args.trace:
+        trace.save(args.trace)
 
-    sdmem.dump()
-    vdmem.dump()
+    sdmem.dump(args.dump_mode)
+    vdmem.dump(args.dump_mode)
 
     # THE END
\ No newline at end of file
@@ -0,0 +1,162 @@
+from collections import deque
+
+import numpy as np
+
+# Banked VDMEM timing model. A bank that accepts a request stays busy for busyCycles cycles. Requests
+# to a busy bank either wait in that bank's queue (bankQueueDepth > 0) or are refused, in which case
+# the issuing lane retries the next cycle. Addresses are spread over the banks by one of:
+#   modulo - idx % banks
+#   xor    - the bank bits XORed with the next bits of the word address
+#   skewed - every row of banks is rotated by one, so a stride of banks no longer hits a single bank
+
+BANK_BUSY_CYCLES = 6
+INTERLEAVINGS = ["modulo", "xor", "skewed"]
+
+def bank_options(config): # DMEM keyword arguments from the optional Config.txt bank parameters.
+    return {"busyCycles": config.get("bankBusyCycles", BANK_BUSY_CYCLES),
+            "interleave": config.get("bankInterleave", "modulo"),
+            "queueDepth": config.get("bankQueueDepth", 0)}
+
+class BankedMemory(object):
+    def __init__(self, numBanks, busyCycles=BANK_BUSY_CYCLES, interleave="modulo", queueDepth=0):
+        if interleave not in INTERLEAVINGS:
+            raise Exception(f"BankedMemory - ERROR: Unknown interleaving {interleave}, expected one of {INTERLEAVINGS}")
+        self.numBanks = numBanks
+        self.busyCycles = busyCycles
+        self.interleave = interleave
+        self.queueDepth = queueDepth
+        self.bankOf = getattr(self, "_" + interleave)
+        # Addresses this far apart always map to the same bank (None if there is no such period).
+        if interleave == "modulo":
+            self.period = numBanks
+        elif interleave == "skewed" or numBanks & (numBanks - 1) == 0:
+            self.period = numBanks * numBanks
+        else:
+            self.period = None
+
+        self.bb = [0 for _ in range(numBanks)] # Cycles each bank stays busy.
+        self.queues = [deque() for _ in range(numBanks)]
+        self._queued = 0
+
+        # Statistics
+        self.accesses = [0 for _ in range(numBanks)] # Requests served.
+        self.conflicts = [0 for _ in range(numBanks)] # Requests that found the bank busy, queued or refused.
+        self.stallCycles = 0 # Cycles in which a vector load/store had a lane blocked on a busy bank.
+
+    def _modulo(self, idx):
+        return idx % self.numBanks
+
+    def _xor(self, idx):
+        return (idx ^ (idx // self.numBanks)) % self.numBanks
+
+    def _skewed(self, idx):
+        return (idx + idx // self.numBanks) % self.numBanks
+
+    def request(self, idx):
+        # Returns the cycles until the bank starts serving idx (0 if it does so now), or None if the
+        # bank is busy and its queue is full.
+        bank = self.bankOf(idx)
+        if not self.bb[bank]:
+            self.bb[bank] = self.busyCycles
+            self.accesses[bank] += 1
+            return 0
+        self.conflicts[bank] += 1
+        queue = self.queues[bank]
+        if len(queue) < self.queueDepth:
+            queue.append(idx)
+            self._queued += 1
+            return self.bb[bank] + self.busyCycles * (len(queue) - 1)
+        return None
+
+    def arbitrate(self, waiting, addresses):
+        # One cycle of requests from lanes grouped by bank, as if every lane called request() in lane
+        # order. waiting maps a bank to the lanes holding a request to it, ascending, and addresses
+        # holds each lane's address. Accepted lanes leave waiting; returns (lane, wait) of each.
+        bb, accepted = self.bb, []
+        for bank in list(waiting):
+            lanes = waiting[bank]
+            if not bb[bank]:
+                while lanes and not bb[bank]: # With busyCycles 0 the bank stays free for the next lane.
+                    bb[bank] = self.busyCycles
+                    self.accesses[bank] += 1
+                    accepted.append((lanes.pop(0), 0))
+                if not lanes:
+                    del waiting[bank]
+                    continue
+            if self.queueDepth:
+                queue = self.queues[bank]
+                while lanes and len(queue) < self.queueDepth:
+                    lane = lanes.pop(0)
+                    self.conflicts[bank] += 1
+                    queue.append(addresses[lane])
+                    self._queued += 1
+                    accepted.append((lane, bb[bank] + self.busyCycles * (len(queue) - 1)))
+            self.conflicts[bank] += len(lanes)
+            if not lanes:
+                del waiting[bank]
+        return accepted
+
+    def refused(self, idx, n): # n retries of a refused request that event-driven mode jumped over.
+        self.conflicts[self.bankOf(idx)] += n
+
+    def recordStall(self, n=1):
+        self.stallCycles += n
+
+    def busyFor(self, idx): # Cycles until the bank holding idx can accept or queue a request.
+        bank = self.bankOf(idx)
+        if len(self.queues[bank]) < self.queueDepth:
+            return 0
+        return self.bb[bank]
+
+    def drainCycles(self): # Cycles until every queued request has started being served.
+        if not self._queued:
+            return 0
+        return max(self.bb[b] + self.busyCycles * (len(q) - 1) for b, q in enumerate(self.queues) if q)
+
+    def cycle(self):
+        if not self._queued:
+            self.bb = [b and b - 1 for b in self.bb]
+            return
+        for i in range(self.numBanks):
+            if self.bb[i]:
+                self.bb[i] -= 1
+                if not self.bb[i] and self.queues[i]:
+                    self.queues[i].popleft()
+                    self._queued -= 1
+                    self.bb[i] = self.busyCycles
+                    self.accesses[i] += 1
+
+    def remainingCycles(self): # Cycles until every bank is idle.
+        if self._queued:
+            return self.drainCycles() + self.busyCycles
+        return max(self.bb)
+
+    def skip(self, n): # Equivalent to calling cycle() n times.
+        if self._queued:
+            for _ in range(n):
+                self.cycle()
+            return
+        for i in range(self.numBanks):
+            self.bb[i] = max(self.bb[i] - n, 0)
+
+    def state(self):
+        # Integer arrays for a checkpoint: busy counters, statistics and the queued requests.
+        return {"bb": np.array(self.bb, dtype=np.int64), "accesses": np.array(self.accesses, dtype=np.int64),
+                "conflicts": np.array(self.conflicts, dtype=np.int64), "stallCycles": np.array(self.stallCycles),
+                "queueLengths": np.array([len(q) for q in self.queues], dtype=np.int64),
+                "queued": np.array([idx for q in self.queues for idx in q], dtype=np.int64)}
+
+    def setState(self, state):
+        self.bb = state["bb"].tolist()
+        self.accesses, self.conflicts = state["accesses"].tolist(), state["conflicts"].tolist()
+        self.stallCycles = int(state["stallCycles"])
+        queued = iter(state["queued"].tolist())
+        self.queues = [deque(next(queued) for _ in range(n)) for n in state["queueLengths"].tolist()]
+        self._queued = len(state["queued"])
+
+    def stats(self):
+        return {"interleave": self.interleave,
+                "busyCycles": self.busyCycles,
+                "accesses": list(self.accesses),
+                "conflicts": list(self.conflicts),
+                "stallCycles": self.stallCycles}
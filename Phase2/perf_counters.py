@@ -0,0 +1,76 @@
+import json
+
+import numpy as np
+
+# Hardware-style performance counters of a timing run, reported as JSON. The core bumps them as it
+# goes; event-driven mode adds the cycles it jumps over so both modes report the same numbers.
+
+class PerfCounters(object):
+    def __init__(self, queueNames, numLanes):
+        self.numLanes = numLanes
+        self.issued = 0 # Instructions that left decode.
+        self.decodeStalls = {"register": 0, "queue": 0} # Cycles decode was blocked, by cause.
+        self.queueDepthSum = dict.fromkeys(queueNames, 0) # Per-cycle queue depths, summed.
+        self.queueDepthMax = dict.fromkeys(queueNames, 0)
+        self.vlsCycles = 0 # Cycles a vector load/store spent sending requests to the banks.
+        self.laneRequests = 0 # Requests lanes got accepted during those cycles.
+
+    def sampleQueues(self, queues, n=1): # queues: (name, queue) pairs.
+        depthSum, depthMax = self.queueDepthSum, self.queueDepthMax
+        for key, queue in queues:
+            if queue:
+                depth = len(queue)
+                depthSum[key] += depth * n
+                if depth > depthMax[key]:
+                    depthMax[key] = depth
+
+    def state(self): # Integer array for a checkpoint.
+        return np.array([self.issued, self.vlsCycles, self.laneRequests] + list(self.decodeStalls.values()) +
+                        list(self.queueDepthSum.values()) + list(self.queueDepthMax.values()), dtype=np.int64)
+
+    def setState(self, state):
+        values = iter(int(v) for v in state)
+        self.issued, self.vlsCycles, self.laneRequests = next(values), next(values), next(values)
+        for counts in [self.decodeStalls, self.queueDepthSum, self.queueDepthMax]:
+            for key in counts:
+                counts[key] = next(values)
+
+    def report(self, core):
+        cycles = max(core.cycles, 1)
+        units = {}
+        for key, pool in core._EXFront.items():
+            for unit in pool.units:
+                units[unit.name] = {"busyCycles": unit.busyCycles, "utilization": round(unit.busyCycles / cycles, 4),
+                                    "averageOccupancy": round(unit.occupancySum / cycles, 4)}
+        capacity = {"vDQ": core.config.dataQueueDepth, "vCQ": core.config.computeQueueDepth, "sQ": None}
+        queues = {key: {"averageDepth": round(total / cycles, 4), "maxDepth": self.queueDepthMax[key], "capacity": capacity.get(key)}
+                  for key, total in self.queueDepthSum.items()}
+        slots = self.vlsCycles * self.numLanes
+        lanes = {"numLanes": self.numLanes, "vlsCycles": self.vlsCycles, "requestsAccepted": self.laneRequests,
+                 "utilization": round(self.laneRequests / slots, 4) if slots else 0.0}
+        banks = core.VDMEM.banks.stats()
+        banks["conflictRate"] = round(sum(banks["conflicts"]) / max(sum(banks["accesses"]) + sum(banks["conflicts"]), 1), 4)
+        report = {"cycles": core.cycles,
+                  "instructions": self.issued,
+                  "ipc": round(self.issued / cycles, 4),
+                  "decodeStalls": dict(self.decodeStalls),
+                  "units": units,
+                  "queues": queues,
+                  "lanes": lanes,
+                  "vdmemBanks": banks}
+        if core.fastForward is not None:
+            report["fastForward"] = core.fastForward.report()
+        if core.vlsModel is not None:
+            report["analyticVLS"] = core.vlsModel.report()
+        if core.fastForward is not None:
+            # Approximate mode extrapolates every counter over periods whose bank pattern may differ from
+            # the sampled ones, and its error bound only covers the cycles: the rest are flagged as estimates.
+            estimated = not core.fastForward.exact and core.fastForward.jumps
+            report["fastForward"]["estimated"] = [key for key in report if key not in ["cycles", "fastForward"]] if estimated else []
+            if estimated:
+                banks["estimated"] = True
+        return report
+
+    def save(self, core, path):
+        with open(path, 'w') as out:
+            json.dump(self.report(core), out, indent=2)
@@ -0,0 +1,84 @@
+import json
+
+# Per-instruction pipeline timeline of a timing run. The core calls the hooks below only when a
+# recorder is attached, so an unrecorded run pays one None check per hook site.
+#
+# Every dynamic instruction gets the cycle it was fetched, first decoded, issued into a dispatch queue,
+# started on an execution unit and completed, the unit it ran on, and the cycles it spent stalled:
+# in decode on a busy register or a full queue, and in execution on VDMEM bank conflicts.
+
+STALL_REASONS = ["register", "queue", "bank"]
+
+FETCH, DECODE, ISSUE, START, COMPLETE, UNIT, NAME = range(7)
+
+class PipelineRecorder(object):
+    def __init__(self):
+        self.records = {} # Dynamic index -> [fetch, decode, issue, start, complete, unit, name, stalls]
+        self._bankStalls = {} # Dynamic index -> bank stall counter when the instruction started.
+
+    def _record(self, PC):
+        record = self.records.get(PC)
+        if record is None:
+            record = self.records[PC] = [None, None, None, None, None, None, None, dict.fromkeys(STALL_REASONS, 0)]
+        return record
+
+    def fetch(self, PC, cycle, instr):
+        record = self._record(PC)
+        record[FETCH] = cycle
+        record[NAME] = instr.name
+
+    def decode(self, PC, cycle): # Called on every decode attempt; keeps the first.
+        record = self._record(PC)
+        if record[DECODE] is None:
+            record[DECODE] = cycle
+
+    def issue(self, PC, cycle):
+        self._record(PC)[ISSUE] = cycle
+
+    def stall(self, PC, reason, cycles=1):
+        self._record(PC)[-1][reason] += cycles
+
+    def start(self, PC, cycle, unit, bankStalls=None): # bankStalls: VDMEM stall counter, for vector loads/stores.
+        record = self._record(PC)
+        record[START] = cycle
+        record[UNIT] = unit
+        if bankStalls is not None:
+            self._bankStalls[PC] = bankStalls
+
+    def complete(self, PC, cycle, bankStalls):
+        record = self._record(PC)
+        record[COMPLETE] = cycle
+        if PC in self._bankStalls:
+            record[-1]["bank"] += bankStalls - self._bankStalls.pop(PC)
+
+    def entries(self): # (dynamic index, record) in program order.
+        return sorted(self.records.items())
+
+    def chromeTrace(self):
+        # Trace Event Format (chrome://tracing, ui.perfetto.dev). One cycle is shown as one microsecond;
+        # every unit and the decode stage get a thread of their own.
+        threads = {"decode": 0}
+        events = []
+        for PC, record in self.entries():
+            name, stalls = record[NAME] or "?", record[-1]
+            args = {"PC": PC, "fetch": record[FETCH], "decode": record[DECODE], "issue": record[ISSUE],
+                    "start": record[START], "complete": record[COMPLETE], "unit": record[UNIT]}
+            args.update({reason + "Stalls": n for reason, n in stalls.items()})
+            if record[DECODE] is not None and record[ISSUE] is not None and record[ISSUE] > record[DECODE]:
+                reason = max(["register", "queue"], key=lambda r: stalls[r])
+                events.append({"name": f"{name} stalled: {reason}", "cat": "stall", "ph": "X", "pid": 0, "tid": 0,
+                               "ts": record[DECODE], "dur": record[ISSUE] - record[DECODE], "args": args})
+            if record[START] is not None and record[COMPLETE] is not None:
+                tid = threads.setdefault(record[UNIT], len(threads))
+                events.append({"name": name, "cat": "execute", "ph": "X", "pid": 0, "tid": tid,
+                               "ts": record[START], "dur": max(record[COMPLETE] - record[START], 1), "args": args})
+            elif record[ISSUE] is not None and record[START] is None:
+                events.append({"name": f"{name} dropped", "cat": "decode", "ph": "i", "s": "t", "pid": 0, "tid": 0,
+                               "ts": record[ISSUE], "args": args})
+        meta = [{"name": "process_name", "ph": "M", "pid": 0, "args": {"name": "Vector Core"}}]
+        meta += [{"name": "thread_name", "ph": "M", "pid": 0, "tid": tid, "args": {"name": unit}} for unit, tid in threads.items()]
+        return {"traceEvents": meta + events, "displayTimeUnit": "ns", "otherData": {"timeUnit": "cycle"}}
+
+    def save(self, path):
+        with open(path, 'w') as out:
+            json.dump(self.chromeTrace(), out)
@@ -0,0 +1,183 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import signal
+import subprocess
+import argparse
+import tempfile
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+from func_simulator import get_control_flow
+from as16513_ra2466_timingsimulator import Config, IMEM, DMEM, Core
+from memory_system import bank_options
+
+# Batch regression run over every test directory (any directory holding a Code.asm). Each test is
+# copied to a scratch directory, so the checked-in outputs are never overwritten, and run in a worker
+# process: the Phase1 simulator if it sits in the test's parent directory, else the timing simulator
+# if the directory has a Config.txt and the functional simulator alone otherwise. The outputs are
+# compared byte for byte with the files checked in next to Code.asm and the cycle count with
+# GOLDEN_CYCLES. A test that must fail instead checks in ERROR_FILE, holding the expected error with
+# the scratch directory written as <iodir>.
+
+INPUT_FILES = ["Code.asm", "SDMEM.txt", "VDMEM.txt", "Config.txt"]
+OUTPUT_FILES = ["SRF.txt", "VRF.txt", "SDMEMOP.txt", "VDMEMOP.txt"]
+ERROR_FILE = "Error.txt"
+GOLDEN_CYCLES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_cycles.json")
+DEFAULT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASE1_SIMULATOR = "as16513_ra2466_funcsimulator.py"
+
+# Tests whose program never reaches HALT, so they have no outputs to check. They are not run.
+SKIPPED = {"Phase1/Dot_Product": "no HALT, runs past the end of Code.asm",
+           "Phase1/ISA_Sample": "no HALT, branches back forever"}
+
+def discover(roots):
+    tests = []
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith(".") and d != "__pycache__")
+            if "Code.asm" in filenames:
+                tests.append(os.path.abspath(dirpath))
+    return sorted(tests)
+
+@contextlib.contextmanager
+def time_limit(seconds):
+    # Raises TimeoutError in the worker if a test runs too long (some programs never reach HALT).
+    if not seconds or not hasattr(signal, "SIGALRM"):
+        yield
+        return
+    def expire(signum, frame):
+        raise TimeoutError(f"no HALT after {seconds}s")
+    previous = signal.signal(signal.SIGALRM, expire)
+    signal.alarm(seconds)
+    try:
+        yield
+    finally:
+        signal.alarm(0)
+        signal.signal(signal.SIGALRM, previous)
+
+def run_test(testdir, timeout=0, eventDriven=False):
+    # Runs one test in a scratch copy and returns its outputs (file name -> contents) and cycle count.
+    workdir = tempfile.mkdtemp(prefix="regression-")
+    start = time.perf_counter()
+    result = {"test": testdir, "cycles": None, "outputs": {}, "error": None}
+    try:
+        for name in INPUT_FILES:
+            if os.path.exists(os.path.join(testdir, name)):
+                shutil.copyfile(os.path.join(testdir, name), os.path.join(workdir, name))
+        simulator = os.path.join(os.path.dirname(testdir), PHASE1_SIMULATOR)
+        with time_limit(timeout), contextlib.redirect_stdout(io.StringIO()):
+            if os.path.exists(simulator):
+                run = subprocess.run([sys.executable, simulator, "--iodir", workdir], capture_output=True, text=True)
+                if run.returncode != 0:
+                    raise Exception(f"Regression - ERROR: {PHASE1_SIMULATOR} exited with {run.returncode}: {(run.stderr.strip().splitlines() or [''])[-1]}")
+            elif os.path.exists(os.path.join(workdir, "Config.txt")):
+                config = Config(workdir)
+                vcore = Core(IMEM(workdir), DMEM("SDMEM", workdir, 13), DMEM("VDMEM", workdir, 17, config.vdmNumBanks, **bank_options(config)), config, eventDriven)
+                vcore.run()
+                result["cycles"] = vcore.cycles
+            else:
+                get_control_flow(workdir)
+        for name in OUTPUT_FILES:
+            path = os.path.join(workdir, name)
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    result["outputs"][name] = f.read()
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}".replace(workdir, "<iodir>")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+def compare(result, goldenCycles, root):
+    # Adds status ("pass", "fail", "error" or "new": nothing to compare against) and the mismatches.
+    testdir, mismatches, compared = result["test"], [], 0
+    if os.path.exists(os.path.join(testdir, ERROR_FILE)):
+        with open(os.path.join(testdir, ERROR_FILE), 'r') as f:
+            expected = f.read().strip()
+        if result["error"] != expected:
+            mismatches.append(f"expected error {expected!r}")
+        result.update(status="fail" if mismatches else "pass", mismatches=mismatches, error=None)
+        return result
+    if result["error"]:
+        result.update(status="error", mismatches=[])
+        return result
+    for name, data in result["outputs"].items():
+        golden = os.path.join(testdir, name)
+        if os.path.exists(golden):
+            compared += 1
+            with open(golden, 'rb') as f:
+                if f.read() != data:
+                    mismatches.append(name)
+    key = os.path.relpath(testdir, root)
+    if result["cycles"] is not None and key in goldenCycles:
+        compared += 1
+        if goldenCycles[key] != result["cycles"]:
+            mismatches.append(f"cycles {result['cycles']} != {goldenCycles[key]}")
+    result.update(status="fail" if mismatches else ("pass" if compared else "new"), mismatches=mismatches)
+    return result
+
+def update_golden(result, goldenCycles, root):
+    # Makes this run's outputs and cycle count the new golden results.
+    for name, data in result["outputs"].items():
+        with open(os.path.join(result["test"], name), 'wb') as f:
+            f.write(data)
+    if result["cycles"] is not None:
+        goldenCycles[os.path.relpath(result["test"], root)] = result["cycles"]
+
+def load_golden_cycles(path=GOLDEN_CYCLES):
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def run_suite(tests, jobs=None, timeout=0, eventDriven=False):
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        futures = [pool.submit(run_test, test, timeout, eventDriven) for test in tests]
+        return [future.result() for future in futures]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Vector Core Regression Runner')
+    parser.add_argument('roots', nargs='*', default=[DEFAULT_ROOT], help='Directories searched for tests (default: the whole repository).')
+    parser.add_argument('--jobs', default=None, type=int, help='Worker processes (default: one per CPU).')
+    parser.add_argument('--timeout', default=120, type=int, help='Seconds before a test is reported as an error; 0 disables the limit.')
+    parser.add_argument('--golden-cycles', default=GOLDEN_CYCLES, type=str, help='JSON file of golden cycle counts, keyed by test path relative to the repository.')
+    parser.add_argument('--update', action='store_true', help='Write this run\'s outputs and cycle counts back as the golden results.')
+    parser.add_argument('--json', default=None, type=str, help='Also write the results to this JSON file.')
+    parser.add_argument('--event-driven', action='store_true', help='Run the timing simulator in event-driven mode; the cycle counts must still match the golden ones.')
+    args = parser.parse_args()
+
+    tests = discover(args.roots)
+    skipped = [test for test in tests if os.path.relpath(test, DEFAULT_ROOT) in SKIPPED]
+    goldenCycles = load_golden_cycles(args.golden_cycles)
+    start = time.perf_counter()
+    results = run_suite([test for test in tests if test not in skipped], args.jobs, args.timeout, args.event_driven)
+    wall = time.perf_counter() - start
+    for result in results:
+        compare(result, goldenCycles, DEFAULT_ROOT)
+    results = sorted(results + [{"test": test, "cycles": None, "error": None, "seconds": 0.0, "status": "skip",
+                                 "mismatches": [], "reason": SKIPPED[os.path.relpath(test, DEFAULT_ROOT)]} for test in skipped], key=lambda r: r["test"])
+
+    for result in results:
+        if args.update and result["status"] in ["fail", "new"]:
+            update_golden(result, goldenCycles, DEFAULT_ROOT)
+        detail = result["error"] or result.get("reason") or ", ".join(result["mismatches"])
+        cycles = "" if result["cycles"] is None else result["cycles"]
+        print(f"{result['status'].upper():6} {os.path.relpath(result['test'], DEFAULT_ROOT):40} {cycles:>10} {result['seconds']:>9.2f}s  {detail}")
+
+    if args.update:
+        with open(args.golden_cycles, 'w') as f:
+            json.dump(goldenCycles, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    counts = {status: sum(r["status"] == status for r in results) for status in ["pass", "fail", "error", "new", "skip"]}
+    print(f"\nRegression - {len(results)} tests in {wall:.2f}s wall ({sum(r['seconds'] for r in results):.2f}s total): " + ", ".join(f"{n} {s}" for s, n in counts.items()))
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump([{k: v for k, v in r.items() if k != "outputs"} for r in results], f, indent=2)
+    exit(1 if counts["fail"] or counts["error"] else 0)
@@ -0,0 +1,136 @@
+import numpy as np
+
+from decoder import Opcode, REGISTER_FILES
+
+# Register scoreboard for the timing core's decode stage. Busy state is held in integer bitmasks over
+# both register files (scalar registers in the low bits, vector registers above them), so checking an
+# instruction is one AND against a mask cached per operand tuple.
+#
+# Without a hazard list the scoreboard keeps the core's original model: one busy bit per register, an
+# instruction issues once none of the registers it names are busy, and the core sets and clears exactly
+# the registers it passes in. Given any of RAW, WAR and WAW it instead tracks the reads and writes of
+# every in-flight instruction and stalls only on the selected hazard kinds.
+
+HAZARDS = ["RAW", "WAR", "WAW"]
+
+# Opcodes whose first register operand is written; every other register operand is read.
+WRITES_FIRST = {Opcode[name] for name in ['ADDVV', 'SUBVV', 'MULVV', 'DIVVV', 'ADDVS', 'SUBVS', 'MULVS', 'DIVVS',
+                                          'POP', 'MFCL', 'LS', 'LV', 'LVWS', 'LVI',
+                                          'ADD', 'SUB', 'AND', 'OR', 'XOR', 'SLL', 'SRL', 'SRA']}
+
+def parse_hazards(spec):
+    # "RAW,WAW" -> ["RAW", "WAW"]; an empty spec selects the single busy bit model.
+    hazards = [h.strip().upper() for h in spec.split(",") if h.strip()]
+    for h in hazards:
+        if h not in HAZARDS:
+            raise Exception(f"Scoreboard - ERROR: Unknown hazard {h}, expected any of {HAZARDS}")
+    return hazards
+
+class Scoreboard(object):
+    def __init__(self, numRegs=8, hazards=None):
+        self.numRegs = numRegs
+        self.hazards = list(hazards) if hazards else []
+        self._raw = "RAW" in self.hazards
+        self._war = "WAR" in self.hazards
+        self._waw = "WAW" in self.hazards
+        self._offset = {"S": 0, "V": numRegs}
+
+        self.busy = 0 # Registers with a pending writer (in the busy bit model, every marked register).
+        self.reading = 0 # Registers with a pending reader, tracked only when hazards are given.
+        self.writer = [None] * (2 * numRegs) # Dynamic index of the latest pending writer of each register.
+        self._writers = [0] * (2 * numRegs) # In-flight writer/reader counts per register.
+        self._readers = [0] * (2 * numRegs)
+
+        self.version = 0 # Bumped on every change, so callers can tell the busy state has not changed.
+
+        self._masks = {} # Register operand tuple -> (mask, bits)
+        self._access = {} # (opcode, register numbers) -> (read mask, read bits, write mask, write bits)
+
+    def bit(self, reg): # reg: decoder.Register
+        return self._offset[reg[0]] + reg[1]
+
+    def _mask(self, regs):
+        entry = self._masks.get(regs)
+        if entry is None:
+            bits = sorted({self.bit(reg) for reg in regs})
+            entry = self._masks[regs] = (sum(1 << b for b in bits), bits)
+        return entry
+
+    def _accesses(self, instr):
+        key = (instr.opcode, instr.operands)
+        entry = self._access.get(key)
+        if entry is None:
+            regs = [self._offset[f] + idx for f, idx in zip(REGISTER_FILES[instr.opcode], instr.operands)]
+            writes = regs[:1] if instr.opcode in WRITES_FIRST else []
+            reads = sorted(set(regs[len(writes):]))
+            entry = self._access[key] = (sum(1 << b for b in reads), reads, sum(1 << b for b in writes), writes)
+        return entry
+
+    def ready(self, instr, *regs, ignore=0): # ignore: bits whose pending writer the caller chains from.
+        busy = self.busy & ~ignore
+        if not self.hazards:
+            return not busy & self._mask(regs)[0]
+        readMask, _, writeMask, _ = self._accesses(instr)
+        if self._raw and busy & readMask:
+            return False
+        if self._waw and self.busy & writeMask:
+            return False
+        if self._war and self.reading & writeMask:
+            return False
+        return True
+
+    def reserve(self, PC, instr, *regs):
+        self.version += 1
+        if not self.hazards:
+            mask, bits = self._mask(regs)
+            self.busy |= mask
+            for b in bits:
+                self.writer[b] = PC
+            return
+        _, reads, _, writes = self._accesses(instr)
+        for b in writes:
+            self._writers[b] += 1
+            self.writer[b] = PC
+            self.busy |= 1 << b
+        for b in reads:
+            self._readers[b] += 1
+            self.reading |= 1 << b
+
+    def release(self, instr, *regs):
+        self.version += 1
+        if not self.hazards:
+            mask, bits = self._mask(regs)
+            self.busy &= ~mask
+            for b in bits:
+                self.writer[b] = None
+            return
+        _, reads, _, writes = self._accesses(instr)
+        for b in writes:
+            self._writers[b] -= 1
+            if self._writers[b] == 0:
+                self.busy &= ~(1 << b)
+                self.writer[b] = None
+        for b in reads:
+            self._readers[b] -= 1
+            if self._readers[b] == 0:
+                self.reading &= ~(1 << b)
+
+    def state(self, base=0, none=-1):
+        # Integer array for a checkpoint: busy, reading, then per register its writer (relative to
+        # base, none if there is none) and writer/reader counts.
+        writer = [none if w is None else w - base for w in self.writer]
+        return np.array([self.busy, self.reading] + writer + self._writers + self._readers, dtype=np.int64)
+
+    def setState(self, state, base=0, none=-1):
+        self.version += 1
+        n = 2 * self.numRegs
+        values = [int(v) for v in state]
+        self.busy, self.reading = values[:2]
+        self.writer = [None if w == none else w + base for w in values[2:2 + n]]
+        self._writers, self._readers = values[2 + n:2 + 2 * n], values[2 + 2 * n:2 + 3 * n]
+
+    def pendingWriter(self, reg): # Dynamic index of the instruction that will write reg, or None.
+        return self.writer[self.bit(reg)]
+
+    def isBusy(self, reg):
+        return bool(self.busy >> self.bit(reg) & 1)
@@ -0,0 +1,109 @@
+import os
+import io
+import csv
+import time
+import shutil
+import argparse
+import itertools
+import tempfile
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+from func_simulator import get_control_flow
+from as16513_ra2466_timingsimulator import Config, IMEM, DMEM, Core
+from memory_system import bank_options
+
+# Design-space exploration over Config.txt parameters. The functional simulator runs once, its trace
+# is saved to a memory-mapped file, and every point of the cartesian product of the swept parameters
+# is timed in a worker process that maps that same file.
+
+def parse_range(spec):
+    # "4,8,16" -> [4, 8, 16]; "2:10:2" -> [2, 4, 6, 8, 10] (stop is inclusive, step defaults to 1);
+    # values that are not integers must be names and are kept as strings, e.g. "modulo,xor" for
+    # bankInterleave. A range that yields no values is an error.
+    values = []
+    for part in (p.strip() for p in spec.split(",")):
+        if ":" in part:
+            try:
+                bounds = [int(b) for b in part.split(":")]
+            except ValueError:
+                bounds = []
+            if len(bounds) not in (2, 3) or (len(bounds) == 3 and bounds[2] == 0):
+                raise Exception(f"Sweep - ERROR: Invalid range {part!r} in {spec!r}; expected start:stop or start:stop:step with integers and a non-zero step")
+            start, stop, step = bounds[0], bounds[1], bounds[2] if len(bounds) > 2 else 1
+            steps = range(start, stop + (1 if step > 0 else -1), step)
+            if not steps:
+                raise Exception(f"Sweep - ERROR: Range {part!r} in {spec!r} is empty")
+            values.extend(steps)
+        else:
+            try:
+                values.append(int(part))
+            except ValueError:
+                if not part.isidentifier():
+                    raise Exception(f"Sweep - ERROR: Invalid value {part!r} in {spec!r}; expected an integer or a name")
+                values.append(part)
+    return values
+
+def sweep_points(ranges):
+    names = list(ranges)
+    return [dict(zip(names, values)) for values in itertools.product(*(ranges[name] for name in names))]
+
+def time_point(iodir, tracepath, point, eventDriven=False):
+    # Times one configuration against a saved trace and returns the point extended with its results.
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        config = Config(iodir, point)
+        imem = IMEM(iodir)
+        sdmem = DMEM("SDMEM", iodir, 13)
+        vdmem = DMEM("VDMEM", iodir, 17, config.vdmNumBanks, **bank_options(config))
+        vcore = Core(imem, sdmem, vdmem, config, eventDriven)
+        vcore.run(tracepath)
+    return dict(point, cycles=vcore.cycles, seconds=round(time.perf_counter() - start, 4))
+
+def run_sweep(iodir, ranges, jobs=None, eventDriven=False):
+    iodir = os.path.abspath(iodir)
+    points = sweep_points(ranges)
+    tmpdir = tempfile.mkdtemp(prefix="sweep-")
+    try:
+        tracepath = os.path.join(tmpdir, "trace.bin")
+        with contextlib.redirect_stdout(io.StringIO()):
+            get_control_flow(iodir).save(tracepath)
+
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            futures = [pool.submit(time_point, iodir, tracepath, point, eventDriven) for point in points]
+            return [future.result() for future in futures]
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+def write_results(results, path):
+    if path.endswith(".parquet"):
+        try:
+            import pandas as pd
+        except ImportError:
+            raise Exception("Sweep - ERROR: Writing Parquet needs pandas and pyarrow; use a .csv output instead.")
+        pd.DataFrame(results).to_parquet(path, index=False)
+    elif not results:
+        raise Exception("Sweep - ERROR: No sweep points to write")
+    else:
+        with open(path, 'w', newline='') as out:
+            writer = csv.DictWriter(out, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Vector Core Config Sweep')
+    parser.add_argument('--iodir', default="", type=str, help='Path to the folder containing the input files - instructions, data and the base Config.txt.')
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=RANGE', help='Parameter to sweep, e.g. numLanes=2,4,8 or vdmNumBanks=1:16. Repeat for a cartesian product.')
+    parser.add_argument('--out', default="sweep.csv", type=str, help='Results table, .csv or .parquet.')
+    parser.add_argument('--jobs', default=None, type=int, help='Worker processes (default: one per CPU).')
+    parser.add_argument('--event-driven', action='store_true', help='Time each point in event-driven mode.')
+    args = parser.parse_args()
+
+    ranges = {}
+    for param in args.param:
+        name, spec = param.split("=", 1)
+        ranges[name.strip()] = parse_range(spec)
+
+    results = run_sweep(args.iodir, ranges, args.jobs, args.event_driven)
+    write_results(results, args.out)
+    print(f"Sweep - {len(results)} points written to {os.path.abspath(args.out)}")
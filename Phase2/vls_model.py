@@ -0,0 +1,152 @@
+import math
+
+import numpy as np
+
+# Closed-form timing of a vector load/store's request phase. cycle_VLS hands out the pending elements
+# to free lanes in order and retries refused requests every cycle, so with modulo interleaving, idle
+# banks and no other memory traffic the conflict pattern of an access to base + i * stride (all VLR
+# elements enabled) only depends on the element count n, numLanes L, bankBusyCycles B and the number
+# of distinct banks it touches, d = vdmNumBanks / gcd(stride, vdmNumBanks). Element i goes to the bank
+# of residue class i mod d. Four cases are solved; the others fall back to the cycle-by-cycle model:
+#
+#   conflict-free  n <= d or d >= L*B: element i is accepted in cycle i // L + 1, ceil(n / L) cycles.
+#   single cycle   n <= L: the first d elements are accepted, the rest are refused and dropped
+#                  with the lanes, as cycle_VLS does once every element has been handed out.
+#   bank-bound     d <= L < n, B >= 2: every B cycles each bank accepts one request and its lane is
+#                  refilled the next cycle, so the lanes keep holding every bank. The last of the
+#                  R = ceil((n - L) / d) refills is handed out in cycle 2 + (R - 1) * B.
+#   lane-bound     L < d < L*B, d a multiple of L: the elements move through the lanes in groups of
+#                  L, and a round of q = d / L groups covers every bank once, so group g is accepted
+#                  in cycle 1 + (g // q) * B + g % q. The last group is handed out the cycle after the
+#                  one before it is accepted.
+#
+# analyticVLS = 1 in Config.txt replaces the request phase of the solved cases by a countdown, applying
+# the estimated counters up front; the bank busy counters are set so they hold their exact values when
+# the phase ends. analyticVLS = 2 keeps simulating cycle by cycle and checks every estimate against it.
+
+MODES = {1: "analytic", 2: "verify"}
+
+def estimate(n, base, stride, numLanes, banks, queueing=False):
+    # Request phase of n elements, or None if it is not solved in closed form. Returns (cycles,
+    # stallCycles, requests accepted, per-bank {bank: (accesses, conflicts, busy)}, accepts), where busy
+    # is the bank's counter at the end of the last cycle before the banks tick and accepts lists
+    # (element, cycle offset) of every accepted request, None if not known (bank-bound case).
+    # queueing: refused requests would be queued rather than retried, which only the conflict-free
+    # case does not depend on.
+    N, L, B = banks.numBanks, numLanes, banks.busyCycles
+    d = N // math.gcd(stride, N)
+    classes = min(n, d)
+    bankOf = [(base + i * stride) % N for i in range(classes)]
+    if n == 0 or any(banks.bb[b] or banks.queues[b] for b in bankOf):
+        return None
+    counts = [n // d + (i < n % d) for i in range(classes)]
+
+    if n <= d or d >= L * B:
+        cycles = -(-n // L)
+        perBank = {bankOf[i]: (counts[i], 0, max(B - cycles + (i + (counts[i] - 1) * d) // L + 1, 0)) for i in range(classes)}
+        return cycles, 0, n, perBank, [(i, i // L) for i in range(n)]
+    if queueing or B == 0:
+        return None
+    if n <= L:
+        perBank = {bankOf[i]: (1, counts[i] - 1, B) for i in range(d)}
+        return 1, 1, d, perBank, [(i, 0) for i in range(d)]
+    if d <= L and B >= 2:
+        R = -(-(n - L) // d)
+        cycles, last = 2 + (R - 1) * B, n - L - (R - 1) * d
+        held = [L // d + (i < L % d) for i in range(d)] # Lanes holding each bank's requests.
+        perBank = {bankOf[i]: (R, R * (held[i] - 1) + (R - 1) * (B - 1) * held[i] + held[i] - 1 + ((i - L) % d < last), B - 1)
+                   for i in range(d)}
+        return cycles, cycles if L > d else cycles - R, d * R, perBank, None
+    if d % L == 0:
+        q, G = d // L, (n - 1) // L
+        acceptedIn = lambda g: 1 + g // q * B + g % q
+        cycles, stallCycles = acceptedIn(G - 1) + 1, 0
+        accesses, conflicts, last, accepts = [0] * d, [0] * d, [0] * d, []
+        for g in range(G + 1):
+            wait = 1 if g == G and g % q == 0 else B - q if g % q == 0 and g > 0 else 0
+            stallCycles += wait
+            for element in range(g * L, min((g + 1) * L, n)):
+                conflicts[element % d] += wait
+                if g < G or g % q:
+                    accesses[element % d] += 1
+                    last[element % d] = acceptedIn(g)
+                    accepts.append((element, acceptedIn(g) - 1))
+        perBank = {bankOf[i]: (accesses[i], conflicts[i], max(B - cycles + last[i], 0)) for i in range(d)}
+        return cycles, stallCycles, len(accepts), perBank, accepts
+    return None
+
+class VLSModel(object):
+    def __init__(self, mode=1):
+        if mode not in MODES:
+            raise Exception(f"VLSModel - ERROR: Unknown analyticVLS mode {mode}, expected one of {list(MODES)}")
+        self.verify = mode == 2
+        self.stats = {"solved": 0, "simulated": 0, "verified": 0}
+
+    def start(self, fu):
+        # Called on the first request cycle of fu. Returns True if the request phase was replaced by its
+        # estimate; in verify mode the estimate is kept on fu for check() instead.
+        banks, pending = fu._vdmem.banks, fu._pending
+        result = None
+        n = pending.bit_length()
+        if fu._indices is None and pending & (pending + 1) == 0 and banks.interleave == "modulo":
+            result = estimate(n, fu._base, fu._stride, fu._config.numLanes, banks, banks.queueDepth > 0)
+        if result is None or (result[4] is None and fu._chain is not None):
+            self.stats["simulated"] += 1
+            return False
+        self.stats["solved"] += 1
+        if self.verify:
+            fu._estimate = (fu._clock(), result, list(banks.accesses), list(banks.conflicts), banks.stallCycles,
+                            fu._counters.vlsCycles if fu._counters is not None else 0, fu._counters.laneRequests if fu._counters is not None else 0)
+            return False
+
+        cycles, stallCycles, accepted, perBank, accepts = result
+        for bank, (accesses, conflicts, busy) in perBank.items():
+            banks.accesses[bank] += accesses
+            banks.conflicts[bank] += conflicts
+            banks.bb[bank] = busy + cycles - 1
+        banks.recordStall(stallCycles)
+        if fu._counters is not None:
+            fu._counters.vlsCycles += cycles
+            fu._counters.laneRequests += accepted
+        fu._pending = 0
+        fu._flag = False
+        fu.numCycles = cycles - 1 + fu._config.vlsPipelineDepth + banks.busyCycles - 1
+        if fu._chain is not None:
+            now = fu._clock()
+            for element, offset in accepts:
+                fu._chain.accept(element, now + offset)
+            fu._taken = n
+            fu._chain.finish(now + fu.numCycles)
+        return True
+
+    def check(self, fu):
+        # Called at the end of fu's simulated request phase; raises if it differs from the estimate.
+        start, (cycles, stallCycles, accepted, perBank, accepts), accesses, conflicts, stalls, vlsCycles, laneRequests = fu._estimate
+        fu._estimate = None
+        banks = fu._vdmem.banks
+        predicted = {"cycles": cycles, "stallCycles": stallCycles,
+                     "accesses": [accesses[b] + perBank.get(b, (0, 0, 0))[0] for b in range(banks.numBanks)],
+                     "conflicts": [conflicts[b] + perBank.get(b, (0, 0, 0))[1] for b in range(banks.numBanks)],
+                     "busy": {b: v[2] for b, v in perBank.items()}}
+        simulated = {"cycles": fu._clock() - start + 1, "stallCycles": banks.stallCycles - stalls,
+                     "accesses": list(banks.accesses), "conflicts": list(banks.conflicts),
+                     "busy": {b: banks.bb[b] for b in perBank}}
+        if fu._counters is not None:
+            predicted.update(vlsCycles=cycles, laneRequests=accepted)
+            simulated.update(vlsCycles=fu._counters.vlsCycles - vlsCycles, laneRequests=fu._counters.laneRequests - laneRequests)
+        if fu._chain is not None:
+            predicted["readyAt"] = [(fu._chain.elements[e], start + offset + fu._chain.latency) for e, offset in accepts]
+            simulated["readyAt"] = [(e, fu._chain.readyAt[e]) for e, _ in predicted["readyAt"]]
+        for key in predicted:
+            if predicted[key] != simulated[key]:
+                raise Exception(f"VLSModel - ERROR: {fu.instr.opcode.name} at dynamic index {fu._PC}: estimated {key} {predicted[key]}, simulated {simulated[key]}")
+        self.stats["verified"] += 1
+
+    def state(self): # Integer array for a checkpoint.
+        return np.array(list(self.stats.values()), dtype=np.int64)
+
+    def setState(self, state):
+        self.stats = dict(zip(self.stats, (int(v) for v in state)))
+
+    def report(self):
+        return dict({"mode": "verify" if self.verify else "analytic"}, **self.stats)
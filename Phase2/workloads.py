@@ -0,0 +1,374 @@
+import os
+import io
+import argparse
+import contextlib
+from collections import namedtuple
+
+import numpy as np
+
+import func_simulator
+
+# Synthetic workload generator: parameterized vector kernels emitted as Code.asm, SDMEM.txt, VDMEM.txt
+# and a default Config.txt, using only the instructions the simulators implement. Vectors longer than
+# MVL are strip-mined: a loop over the full 64-element strips, then the remainder under a shorter VLR.
+#
+# The ISA has no add-immediate and no way to move a vector element into a scalar register, so
+#   - every constant is a word in SDMEM loaded with LS SRx SR0 <address>,
+#   - scalar operands of a kernel (GEMM's A, GEMV's x, the convolution weights) live in SDMEM.
+# Register conventions: SR0 holds 0, SR5 holds 1 and SR6 is a scratch register; loop counters that do
+# not fit in registers are kept in SDMEM words.
+
+MVL = 64
+SDMEM_WORDS = pow(2, 13)
+VDMEM_WORDS = pow(2, 17)
+ZERO, ONE, TMP = "SR0", "SR5", "SR6"
+
+CONFIG = """# Dispatch Queue parameters
+dataQueueDepth = 4
+computeQueueDepth = 4
+
+# VDMEM LS parameters
+vdmNumBanks = 8
+vlsPipelineDepth = 11
+
+# Compute Pipeline parameters
+numLanes = 8
+pipelineDepthMul = 12
+pipelineDepthAdd = 2
+pipelineDepthDiv = 8
+"""
+
+# code: Code.asm lines, sdmem/vdmem: initial memory images, expected: (VDMEM address, values) of the output.
+Workload = namedtuple("Workload", ["code", "sdmem", "vdmem", "expected"])
+
+class Program(object):
+    # Tiny assembler: labels resolved to the relative branch offsets the ISA uses, and an SDMEM image
+    # holding the kernel's scalar data followed by the constants and counters the code refers to.
+    def __init__(self):
+        self.lines = []
+        self.labels = {}
+        self.sdmem = []
+        self._consts = {}
+
+    def emit(self, *lines):
+        self.lines.extend(lines)
+
+    def newLabel(self):
+        name = f"L{len(self.labels)}"
+        self.labels[name] = None
+        return name
+
+    def label(self, name):
+        self.labels[name] = len(self.lines)
+
+    def branch(self, op, SR1, SR2, label):
+        self.lines.append((op, SR1, SR2, label))
+
+    def data(self, values): # Appends words to SDMEM and returns the address of the first.
+        base = len(self.sdmem)
+        self.sdmem.extend(int(v) for v in values)
+        return base
+
+    def const(self, value):
+        if value not in self._consts:
+            self._consts[value] = self.data([value])
+        return self._consts[value]
+
+    def load(self, SR, value):
+        self.emit(f"LS {SR} {ZERO} {self.const(value)}")
+
+    def advance(self, SR, amount):
+        if amount == 1:
+            self.emit(f"ADD {SR} {SR} {ONE}")
+        elif amount:
+            self.load(TMP, amount)
+            self.emit(f"ADD {SR} {SR} {TMP}")
+
+    def setVL(self, VL):
+        self.load(TMP, VL)
+        self.emit(f"MTCL {TMP}")
+
+    def loop(self, count, body, counter=None):
+        # Runs body() count times, counting down in the counter register or, without one, in an SDMEM word.
+        if count <= 0:
+            return
+        if count == 1:
+            body()
+            return
+        top = self.newLabel()
+        if counter:
+            self.load(counter, count)
+        else:
+            cell = self.data([0])
+            self.load(TMP, count)
+            self.emit(f"SS {TMP} {ZERO} {cell}")
+        self.label(top)
+        body()
+        if counter:
+            self.emit(f"SUB {counter} {counter} {ONE}")
+            self.branch("BGT", counter, ZERO, top)
+        else:
+            self.emit(f"LS {TMP} {ZERO} {cell}", f"SUB {TMP} {TMP} {ONE}", f"SS {TMP} {ZERO} {cell}")
+            self.branch("BGT", TMP, ZERO, top)
+
+    def strips(self, n, body):
+        # body(VL) once per strip of an n-element vector; VLR is back at MVL afterwards.
+        full, rem = divmod(n, MVL)
+        self.loop(full, lambda: body(MVL))
+        if rem:
+            self.setVL(rem)
+            body(rem)
+            self.setVL(MVL)
+
+    def code(self):
+        code = []
+        for i, line in enumerate(self.lines + ["HALT"]):
+            if isinstance(line, tuple):
+                op, SR1, SR2, label = line
+                line = f"{op} {SR1} {SR2} {self.labels[label] - i}"
+            code.append(line)
+        return code
+
+    def workload(self, vdmem, expected):
+        if len(self.sdmem) > SDMEM_WORDS:
+            raise Exception(f"Workloads - ERROR: SDMEM needs {len(self.sdmem)} words, more than its {SDMEM_WORDS}")
+        if len(vdmem) > VDMEM_WORDS:
+            raise Exception(f"Workloads - ERROR: VDMEM needs {len(vdmem)} words, more than its {VDMEM_WORDS}")
+        return Workload(self.code(), self.sdmem, vdmem, expected)
+
+def int32(values):
+    return np.asarray(values, dtype=np.int64).astype(np.int32)
+
+# =======
+# KERNELS
+# =======
+
+
+def saxpy(rng, n=4096, a=3):
+    # y = a*x + y; x at 0, y at n.
+    x, y = rng.integers(-100, 100, n), rng.integers(-100, 100, n)
+    prog = Program()
+    prog.load(ONE, 1)
+    prog.load("SR1", 0)
+    prog.load("SR2", n)
+    prog.load("SR3", a)
+    def strip(VL):
+        prog.emit("LV VR1 SR1", "LV VR2 SR2", "MULVS VR1 VR1 SR3", "ADDVV VR2 VR2 VR1", "SV VR2 SR2")
+        prog.advance("SR1", VL)
+        prog.advance("SR2", VL)
+    prog.strips(n, strip)
+    return prog.workload(int32(np.concatenate([x, y])), (n, int32(a * x + y)))
+
+def gemv(rng, m=256, n=256):
+    # y = A x with A (m x n, row-major) at 0, y at m*n and x in SDMEM. A strip of y accumulates one
+    # strided column of A (LVWS, stride n) times one element of x per step.
+    A, x = rng.integers(-10, 10, (m, n)), rng.integers(-10, 10, n)
+    prog = Program()
+    xbase = prog.data(x)
+    prog.load(ONE, 1)
+    prog.load("SR1", 0)
+    prog.load("SR2", n)
+    prog.load("SR7", m * n)
+    def strip(VL):
+        prog.emit("SUBVV VR0 VR0 VR0")
+        prog.load("SR3", xbase)
+        prog.loop(n, lambda: prog.emit("LVWS VR1 SR1 SR2", f"LS {TMP} SR3 0", f"MULVS VR1 VR1 {TMP}", "ADDVV VR0 VR0 VR1",
+                                       f"ADD SR1 SR1 {ONE}", f"ADD SR3 SR3 {ONE}"), counter="SR4")
+        prog.emit("SV VR0 SR7")
+        prog.advance("SR7", VL)
+        prog.advance("SR1", VL * n - n)
+    prog.strips(m, strip)
+    return prog.workload(int32(A.ravel()), (m * n, int32(A @ x)))
+
+def gemm(rng, m=32, k=32, n=256):
+    # C = A B with B (k x n) at 0, C (m x n) at k*n and A (m x k) in SDMEM. Every strip of a row of C
+    # accumulates k rows of B scaled by the elements of the matching row of A.
+    A, B = rng.integers(-10, 10, (m, k)), rng.integers(-10, 10, (k, n))
+    prog = Program()
+    abase = prog.data(A.ravel())
+    prog.load(ONE, 1)
+    prog.load("SR2", n)
+    prog.load("SR3", abase)
+    prog.load("SR7", k * n)
+    def strip(VL):
+        prog.emit("SUBVV VR0 VR0 VR0")
+        prog.loop(k, lambda: prog.emit(f"LS {TMP} SR3 0", "LV VR1 SR1", f"MULVS VR1 VR1 {TMP}", "ADDVV VR0 VR0 VR1",
+                                       "ADD SR1 SR1 SR2", f"ADD SR3 SR3 {ONE}"), counter="SR4")
+        prog.emit("SV VR0 SR7")
+        prog.advance("SR7", VL)
+        prog.advance("SR1", VL - k * n)
+        prog.advance("SR3", -k)
+    def row():
+        prog.load("SR1", 0)
+        prog.strips(n, strip)
+        prog.advance("SR3", k)
+    prog.loop(m, row)
+    return prog.workload(int32(B.ravel()), (k * n, int32(A @ B).ravel()))
+
+def conv2d(rng, h=64, w=256, r=3, s=3):
+    # Valid 2D cross-correlation of an h x w image at 0 with an r x s kernel in SDMEM; the output
+    # ((h-r+1) x (w-s+1)) follows the image. Each tap is an unaligned unit-stride LV.
+    oh, ow = h - r + 1, w - s + 1
+    if oh < 1 or ow < 1:
+        raise Exception(f"Workloads - ERROR: A {r}x{s} kernel does not fit a {h}x{w} image")
+    image, weights = rng.integers(-10, 10, (h, w)), rng.integers(-3, 4, (r, s))
+    prog = Program()
+    wbase = prog.data(weights.ravel())
+    prog.load(ONE, 1)
+    prog.load("SR2", w - s + 1)
+    prog.load("SR3", h * w)
+    prog.load("SR7", 0)
+    def strip(VL):
+        prog.emit("SUBVV VR0 VR0 VR0", f"ADD SR1 SR7 {ZERO}")
+        for ri in range(r):
+            for si in range(s):
+                prog.emit("LV VR1 SR1", f"LS {TMP} {ZERO} {wbase + ri * s + si}", f"MULVS VR1 VR1 {TMP}", "ADDVV VR0 VR0 VR1")
+                if si < s - 1:
+                    prog.emit(f"ADD SR1 SR1 {ONE}")
+                elif ri < r - 1:
+                    prog.emit("ADD SR1 SR1 SR2")
+        prog.emit("SV VR0 SR3")
+        prog.advance("SR3", VL)
+        prog.advance("SR7", VL)
+    def row():
+        prog.strips(ow, strip)
+        prog.advance("SR7", s - 1)
+    prog.loop(oh, row)
+    out = sum(weights[ri, si] * image[ri:ri + oh, si:si + ow] for ri in range(r) for si in range(s))
+    return prog.workload(int32(image.ravel()), (h * w, int32(out).ravel()))
+
+def strided_reduction(rng, n=2048, stride=8):
+    # Sum of every stride-th word of x (n * stride words at 0): LVWS strips accumulate into VR0, which
+    # is then halved through a 64-word scratch area until one word, the result, is left.
+    x = rng.integers(-100, 100, n * stride)
+    scratch = n * stride
+    prog = Program()
+    prog.load(ONE, 1)
+    prog.load("SR1", 0)
+    prog.load("SR2", stride)
+    prog.emit("SUBVV VR0 VR0 VR0")
+    def strip(VL):
+        prog.emit("LVWS VR1 SR1 SR2", "ADDVV VR0 VR0 VR1")
+        prog.advance("SR1", VL * stride)
+    prog.strips(n, strip)
+    prog.load("SR3", scratch)
+    prog.emit("SV VR0 SR3")
+    half = MVL // 2
+    while half:
+        prog.setVL(half)
+        prog.load("SR4", scratch + half)
+        prog.emit("LV VR1 SR3", "LV VR2 SR4", "ADDVV VR0 VR1 VR2", "SV VR0 SR3")
+        half //= 2
+    return prog.workload(int32(np.concatenate([x, np.zeros(MVL)])), (scratch, int32([x[::stride].sum()])))
+
+def gather_scatter(rng, n=4096, table=16384):
+    # out[perm[i]] = x[idx[i]]: x (table words) at 0, then idx, perm and out of n words each. The
+    # indices are random; perm is a permutation so every output word is written exactly once.
+    x, idx, perm = rng.integers(-1000, 1000, table), rng.integers(0, table, n), rng.permutation(n)
+    prog = Program()
+    prog.load(ONE, 1)
+    prog.load("SR1", table)
+    prog.load("SR2", 0)
+    prog.load("SR3", table + n)
+    prog.load("SR4", table + 2 * n)
+    def strip(VL):
+        prog.emit("LV VR1 SR1", "LVI VR2 SR2 VR1", "LV VR3 SR3", "SVI VR2 SR4 VR3")
+        prog.advance("SR1", VL)
+        prog.advance("SR3", VL)
+    prog.strips(n, strip)
+    out = np.empty(n, dtype=np.int64)
+    out[perm] = x[idx]
+    return prog.workload(int32(np.concatenate([x, idx, perm, np.zeros(n)])), (table + 2 * n, int32(out)))
+
+# Fixed-size loops with one 64-element strip per iteration, used as throughput benchmarks by benchmark.py.
+
+def long_loop(rng, iterations=2000):
+    # Load/add/store round trip in a tight loop: y += x for x (64 words) at 0, y stored after it.
+    x = rng.integers(-100, 100, MVL)
+    prog = Program()
+    prog.load(ONE, 1)
+    prog.load("SR2", MVL)
+    prog.loop(iterations, lambda: prog.emit("LV VR1 SR0", "ADDVV VR2 VR2 VR1", "SV VR2 SR2"), counter="SR1")
+    return prog.workload(int32(np.concatenate([x, np.zeros(MVL)])), (MVL, int32(iterations * x)))
+
+def wide_vectors(rng, iterations=1000, divisor=7):
+    # 64-element arithmetic, five compute instructions per load; only the last iteration's result
+    # ((sum of x*x) - x) // divisor + 1 is stored after x.
+    x = rng.integers(-50, 50, MVL)
+    prog = Program()
+    prog.load(ONE, 1)
+    prog.load("SR2", MVL)
+    prog.load("SR3", divisor)
+    prog.loop(iterations, lambda: prog.emit("LV VR1 SR0", "MULVV VR2 VR1 VR1", "ADDVV VR3 VR3 VR2", "SUBVV VR4 VR3 VR1",
+                                            "DIVVS VR5 VR4 SR3", f"ADDVS VR6 VR5 {ONE}"), counter="SR1")
+    prog.emit("SV VR6 SR2")
+    return prog.workload(int32(np.concatenate([x, np.zeros(MVL)])),
+                         (MVL, int32(int32(int32(iterations * x * x) - x.astype(np.int64)) // divisor + 1)))
+
+def indexed_loop(rng, iterations=300, table=1024):
+    # Indexed loads and stores through one scattered index vector: out[idx] += x[idx] every iteration,
+    # with idx (64 words) at 0, then x and out of table words each.
+    idx, x = rng.integers(0, table, MVL), rng.integers(-1000, 1000, table)
+    prog = Program()
+    prog.load(ONE, 1)
+    prog.load("SR3", MVL)
+    prog.load("SR4", MVL + table)
+    prog.loop(iterations, lambda: prog.emit("LV VR1 SR0", "LVI VR2 SR3 VR1", "ADDVV VR3 VR3 VR2", "SVI VR3 SR4 VR1"), counter="SR1")
+    out = np.zeros(table, dtype=np.int64)
+    out[idx] = iterations * x[idx]
+    return prog.workload(int32(np.concatenate([idx, x, np.zeros(table)])), (MVL + table, int32(out)))
+
+WORKLOADS = {"saxpy": saxpy, "gemv": gemv, "gemm": gemm, "conv2d": conv2d, "reduce": strided_reduction, "gather": gather_scatter,
+             "long_loop": long_loop, "wide_vectors": wide_vectors, "indexed_loop": indexed_loop}
+
+def generate(kernel, seed=0, **params):
+    if kernel not in WORKLOADS:
+        raise Exception(f"Workloads - ERROR: Unknown kernel {kernel}, expected one of {list(WORKLOADS)}")
+    return WORKLOADS[kernel](np.random.default_rng(seed), **params)
+
+def write_program(iodir, code, sdmem, vdmem, config=CONFIG):
+    os.makedirs(iodir, exist_ok=True)
+    with open(os.path.join(iodir, "Code.asm"), 'w') as f:
+        f.write("\n".join(code))
+    with open(os.path.join(iodir, "SDMEM.txt"), 'w') as f:
+        f.write("\n".join(map(str, sdmem)) + "\n")
+    with open(os.path.join(iodir, "VDMEM.txt"), 'w') as f:
+        f.write("\n".join(map(str, vdmem)) + "\n")
+    with open(os.path.join(iodir, "Config.txt"), 'w') as f:
+        f.write(config)
+
+def check(iodir, workload):
+    # Runs the functional simulator in-process and compares the output region with the NumPy result.
+    with contextlib.redirect_stdout(io.StringIO()):
+        vdmem = func_simulator.DMEM("VDMEM", iodir, 17)
+        core = func_simulator.Core(func_simulator.IMEM(iodir), func_simulator.DMEM("SDMEM", iodir, 13), vdmem)
+        trace = core.run()
+    address, values = workload.expected
+    mismatches = np.flatnonzero(vdmem.data[address:address + len(values)] != values)
+    return len(trace), mismatches
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Vector Core Workload Generator')
+    parser.add_argument('kernel', choices=list(WORKLOADS), help='Kernel to generate.')
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=VALUE', help='Kernel size parameter, e.g. n=8192 or m=64. Repeat for several.')
+    parser.add_argument('--seed', default=0, type=int, help='Seed of the random input data.')
+    parser.add_argument('--out', default=None, type=str, help='Output directory (default: ./<kernel>).')
+    parser.add_argument('--check', action='store_true', help='Run the functional simulator on the result and compare it with NumPy.')
+    args = parser.parse_args()
+
+    params = {}
+    for param in args.param:
+        name, value = param.split("=", 1)
+        params[name.strip()] = int(value)
+
+    workload = generate(args.kernel, args.seed, **params)
+    iodir = os.path.abspath(args.out or args.kernel)
+    write_program(iodir, workload.code, workload.sdmem, workload.vdmem)
+    print(f"Workloads - {args.kernel}: {len(workload.code)} instructions, {len(workload.sdmem)} SDMEM and {len(workload.vdmem)} VDMEM words written to {iodir}")
+
+    if args.check:
+        instructions, mismatches = check(iodir, workload)
+        if len(mismatches):
+            print(f"Workloads - ERROR: {len(mismatches)} output words differ from NumPy, first at VDMEM {workload.expected[0] + mismatches[0]}")
+            exit(1)
+        print(f"Workloads - Check passed: {instructions} dynamic instructions, {len(workload.expected[1])} output words match NumPy")